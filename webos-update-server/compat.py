@@ -0,0 +1,8 @@
+"""
+Python version shims shared across the server's packages
+"""
+import sys
+
+# dataclass(**SLOTS): slots=True needs Python 3.10+; older interpreters get
+# regular dataclasses.
+SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
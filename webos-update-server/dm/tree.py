@@ -3,24 +3,42 @@ OMA DM Tree Operations
 
 Manages the server-side device management tree for webOS devices.
 """
-from dataclasses import dataclass, field
-from typing import Dict, Optional, List, Any
-import config
+import sys
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, List, Tuple, Any
+
+# Shared, read-only children mapping for leaves; replaced by a real dict on
+# the first add_child so leaf nodes don't each carry an empty dict.
+_EMPTY: Mapping[str, 'DMNode'] = MappingProxyType({})
 
 
-@dataclass
 class DMNode:
     """A node in the DM tree"""
-    name: str
-    value: Optional[str] = None
-    children: Dict[str, 'DMNode'] = field(default_factory=dict)
-    acl: str = "Get=*&Replace=*"  # Access control list
-    format: str = "chr"  # chr, int, bool, bin, node, null
-    type_: str = "text/plain"
+    __slots__ = ('name', 'value', 'children', 'acl', 'format', 'type_')
+
+    def __init__(
+        self,
+        name: str,
+        value: Optional[str] = None,
+        children: Optional[Dict[str, 'DMNode']] = None,
+        acl: str = "Get=*&Replace=*",  # Access control list
+        format: str = "chr",  # chr, int, bool, bin, node, null
+        type_: str = "text/plain",
+    ):
+        self.name = name
+        self.value = value
+        self.children = children if children else _EMPTY
+        self.acl = acl
+        self.format = format
+        self.type_ = type_
+
+    def __repr__(self) -> str:
+        return f"DMNode(name={self.name!r}, value={self.value!r}, children={len(self.children)})"
 
     def is_leaf(self) -> bool:
         """Check if this is a leaf node (has value, no children)"""
-        return len(self.children) == 0
+        return not self.children
 
     def get_child(self, name: str) -> Optional['DMNode']:
         """Get child node by name"""
@@ -28,6 +46,8 @@ class DMNode:
 
     def add_child(self, node: 'DMNode') -> 'DMNode':
         """Add a child node"""
+        if self.children is _EMPTY:
+            self.children = {}
         self.children[node.name] = node
         return node
 
@@ -35,10 +55,100 @@ class DMNode:
         """Convert to dictionary representation"""
         if self.is_leaf():
             return {"value": self.value, "format": self.format}
-        return {
-            name: child.to_dict()
-            for name, child in self.children.items()
-        }
+
+        # Iterative walk with an explicit stack of (node, output dict) pairs
+        result = {}
+        stack = [(self, result)]
+        while stack:
+            node, out = stack.pop()
+            for name, child in node.children.items():
+                if child.children:
+                    out[name] = sub = {}
+                    stack.append((child, sub))
+                else:
+                    out[name] = {"value": child.value, "format": child.format}
+        return result
+
+
+def _build_standard_tree() -> DMNode:
+    """Build the standard DM tree structure"""
+    root = DMNode(name=".")
+
+    # DevInfo - device information (populated from device)
+    devinfo = DMNode(name="DevInfo")
+    devinfo.add_child(DMNode(name="DevId", value=""))
+    devinfo.add_child(DMNode(name="Man", value=""))
+    devinfo.add_child(DMNode(name="Mod", value=""))
+    devinfo.add_child(DMNode(name="DmV", value=""))
+    devinfo.add_child(DMNode(name="Lang", value=""))
+    devinfo.add_child(DMNode(name="FwV", value=""))
+    devinfo.add_child(DMNode(name="SwV", value=""))
+    devinfo.add_child(DMNode(name="HwV", value=""))
+    root.add_child(devinfo)
+
+    # Software - update management
+    software = DMNode(name="Software")
+    software.add_child(DMNode(name="Build", value=""))
+    software.add_child(DMNode(name="Carrier", value=""))
+
+    # Package info for updates
+    package = DMNode(name="Package")
+    package.add_child(DMNode(name="PkgName", value=""))
+    package.add_child(DMNode(name="PkgVersion", value=""))
+    package.add_child(DMNode(name="PkgURL", value=""))
+    package.add_child(DMNode(name="PkgSize", value=""))
+    package.add_child(DMNode(name="PkgDesc", value=""))
+    package.add_child(DMNode(name="PkgInstallNotify", value=""))
+    software.add_child(package)
+
+    # Download operations
+    operations = DMNode(name="Operations")
+    operations.add_child(DMNode(name="Download", value=""))
+    operations.add_child(DMNode(name="DownloadAndInstall", value=""))
+    operations.add_child(DMNode(name="Install", value=""))
+    software.add_child(operations)
+
+    root.add_child(software)
+
+    # Download management
+    download = DMNode(name="Download")
+    download.add_child(DMNode(name="Status", value=""))
+    download.add_child(DMNode(name="Progress", value=""))
+    root.add_child(download)
+
+    return root
+
+
+def _clone(node: DMNode) -> DMNode:
+    """Copy a node and its subtree (cheaper than copy.deepcopy)"""
+    copy = DMNode(node.name, node.value, None, node.acl, node.format, node.type_)
+    if node.children:
+        copy.children = {name: _clone(child) for name, child in node.children.items()}
+    return copy
+
+
+@lru_cache(maxsize=256)
+def _parse_path(path: str) -> Tuple[str, ...]:
+    """Parse path string to tuple of parts (memoized; DM paths are a small set)"""
+    # Remove leading ./ or /
+    path = path.strip()
+    if path.startswith('./'):
+        path = path[2:]
+    elif path.startswith('.'):
+        path = path[1:]
+    if path.startswith('/'):
+        path = path[1:]
+
+    if not path:
+        return ()
+
+    # Intern segments so child-dict lookups hit the same string objects as
+    # the node names (literals in _build_standard_tree are already interned)
+    return tuple(sys.intern(p) for p in path.split('/') if p)
+
+
+# The standard tree is static: build it once and clone it per DMTree.
+_STANDARD_TREE = _build_standard_tree()
 
 
 class DMTree:
@@ -53,52 +163,18 @@ class DMTree:
     """
 
     def __init__(self):
-        self.root = DMNode(name=".")
-        self._init_standard_tree()
-
-    def _init_standard_tree(self):
-        """Initialize standard DM tree structure"""
-        # DevInfo - device information (populated from device)
-        devinfo = DMNode(name="DevInfo")
-        devinfo.add_child(DMNode(name="DevId", value=""))
-        devinfo.add_child(DMNode(name="Man", value=""))
-        devinfo.add_child(DMNode(name="Mod", value=""))
-        devinfo.add_child(DMNode(name="DmV", value=""))
-        devinfo.add_child(DMNode(name="Lang", value=""))
-        devinfo.add_child(DMNode(name="FwV", value=""))
-        devinfo.add_child(DMNode(name="SwV", value=""))
-        devinfo.add_child(DMNode(name="HwV", value=""))
-        self.root.add_child(devinfo)
-
-        # Software - update management
-        software = DMNode(name="Software")
-        software.add_child(DMNode(name="Build", value=""))
-        software.add_child(DMNode(name="Carrier", value=""))
-
-        # Package info for updates
-        package = DMNode(name="Package")
-        package.add_child(DMNode(name="PkgName", value=""))
-        package.add_child(DMNode(name="PkgVersion", value=""))
-        package.add_child(DMNode(name="PkgURL", value=""))
-        package.add_child(DMNode(name="PkgSize", value=""))
-        package.add_child(DMNode(name="PkgDesc", value=""))
-        package.add_child(DMNode(name="PkgInstallNotify", value=""))
-        software.add_child(package)
-
-        # Download operations
-        operations = DMNode(name="Operations")
-        operations.add_child(DMNode(name="Download", value=""))
-        operations.add_child(DMNode(name="DownloadAndInstall", value=""))
-        operations.add_child(DMNode(name="Install", value=""))
-        software.add_child(operations)
-
-        self.root.add_child(software)
-
-        # Download management
-        download = DMNode(name="Download")
-        download.add_child(DMNode(name="Status", value=""))
-        download.add_child(DMNode(name="Progress", value=""))
-        self.root.add_child(download)
+        self.root = _clone(_STANDARD_TREE)
+        # Flat path -> node index so lookups are a single dict probe. The
+        # hierarchical tree stays authoritative for list_children/to_dict;
+        # set() and delete() keep the two in sync.
+        self._by_path: Dict[Tuple[str, ...], DMNode] = {}
+        self._index(self.root, ())
+
+    def _index(self, node: DMNode, parts: Tuple[str, ...]):
+        """Add node and its subtree to the flat path index"""
+        self._by_path[parts] = node
+        for name, child in node.children.items():
+            self._index(child, parts + (name,))
 
     def get(self, path: str) -> Optional[str]:
         """
@@ -117,10 +193,15 @@ class DMTree:
 
         Creates intermediate nodes if necessary.
         """
-        parts = self._parse_path(path)
+        parts = _parse_path(path)
         if not parts:
             return False
 
+        leaf = self._by_path.get(parts)
+        if leaf is not None:
+            leaf.value = value
+            return True
+
         current = self.root
         for i, part in enumerate(parts[:-1]):
             child = current.get_child(part)
@@ -128,36 +209,31 @@ class DMTree:
                 # Create intermediate node
                 child = DMNode(name=part)
                 current.add_child(child)
+                self._by_path[parts[:i + 1]] = child
             current = child
 
-        # Set or create leaf node
-        leaf_name = parts[-1]
-        leaf = current.get_child(leaf_name)
-        if leaf is None:
-            leaf = DMNode(name=leaf_name, value=value)
-            current.add_child(leaf)
-        else:
-            leaf.value = value
+        # Create leaf node
+        leaf = DMNode(name=parts[-1], value=value)
+        current.add_child(leaf)
+        self._by_path[parts] = leaf
         return True
 
     def delete(self, path: str) -> bool:
         """Delete node at path"""
-        parts = self._parse_path(path)
+        parts = _parse_path(path)
         if not parts:
             return False
 
-        current = self.root
-        for part in parts[:-1]:
-            child = current.get_child(part)
-            if child is None:
-                return False
-            current = child
+        parent = self._by_path.get(parts[:-1])
+        if parent is None or parts[-1] not in parent.children:
+            return False
 
-        leaf_name = parts[-1]
-        if leaf_name in current.children:
-            del current.children[leaf_name]
-            return True
-        return False
+        del parent.children[parts[-1]]
+        # Drop the node and everything below it from the index
+        depth = len(parts)
+        for key in [k for k in self._by_path if k[:depth] == parts]:
+            del self._by_path[key]
+        return True
 
     def exists(self, path: str) -> bool:
         """Check if path exists"""
@@ -172,33 +248,11 @@ class DMTree:
 
     def _get_node(self, path: str) -> Optional[DMNode]:
         """Get node at path"""
-        parts = self._parse_path(path)
-        if not parts:
-            return self.root
+        return self._by_path.get(_parse_path(path))
 
-        current = self.root
-        for part in parts:
-            child = current.get_child(part)
-            if child is None:
-                return None
-            current = child
-        return current
-
-    def _parse_path(self, path: str) -> List[str]:
-        """Parse path string to list of parts"""
-        # Remove leading ./ or /
-        path = path.strip()
-        if path.startswith('./'):
-            path = path[2:]
-        elif path.startswith('.'):
-            path = path[1:]
-        if path.startswith('/'):
-            path = path[1:]
-
-        if not path:
-            return []
-
-        return [p for p in path.split('/') if p]
+    def _parse_path(self, path: str) -> Tuple[str, ...]:
+        """Parse path string to tuple of parts"""
+        return _parse_path(path)
 
     def get_devinfo_paths(self) -> List[str]:
         """Get standard DevInfo paths to query from device"""
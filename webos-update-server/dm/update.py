@@ -4,15 +4,76 @@ Update Manager
 Handles update availability logic and package management for webOS devices.
 """
 import os
+import re
+import mmap
 import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, Optional, List, Any
 from pathlib import Path
-import config
 
+import orjson
+from compat import SLOTS
+
+
+# Checksum published as UpdatePackage.md5. Devices verify downloads with
+# `md5sum` (see direct-update.sh), so this must stay MD5 even though SHA-256 /
+# BLAKE2b hash faster on modern servers.
+PACKAGE_DIGEST = 'md5'
+
+
+def _file_digest(path: Path, algorithm: str = PACKAGE_DIGEST) -> str:
+    """Hex digest of a file, hashed in C where available"""
+    with open(path, 'rb') as f:
+        # Map the file so the digest reads straight from the page cache
+        # without copying through Python buffers. mmap can't map empty files
+        # and may be unavailable on some filesystems; fall back to reading.
+        if os.fstat(f.fileno()).st_size:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # Ask for aggressive read-ahead so the scan pool's
+                    # threads stay busy hashing instead of faulting pages
+                    if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    return hashlib.new(algorithm, mm).hexdigest()
+            except (OSError, ValueError):
+                pass
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+            return hashlib.file_digest(f, algorithm).hexdigest()
+        h = hashlib.new(algorithm)
+        buf = bytearray(1 << 20)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+        return h.hexdigest()
+
+
+_BUILD_RE = re.compile(r'\d+')
+_ZERO_PAD = ((0, 0, 0, 0), (0, 0, 0), (0, 0), (0,), ())
+
+
+@lru_cache(maxsize=256)
+def _parse_build_version(build: str) -> tuple:
+    """
+    Parse build string to comparable tuple.
+
+    Examples:
+        "Nova-3.0.5-64" -> (3, 0, 5, 64)
+        "3.0.5" -> (3, 0, 5, 0)
+    """
+    # Extract version numbers (at most 4 components)
+    numbers = tuple(map(int, _BUILD_RE.findall(build)[:4]))
+
+    # Pad to 4 components
+    return numbers + _ZERO_PAD[len(numbers)]
 
-@dataclass
+
+@dataclass(**SLOTS)
 class UpdatePackage:
     """Represents an update package"""
     name: str
@@ -24,6 +85,17 @@ class UpdatePackage:
     min_version: str = ""  # Minimum device version required
     target_build: str = ""  # Target build number
     install_notify_url: str = ""
+    # Parsed forms of the version strings above, computed once on creation so
+    # check_update_available compares tuples instead of re-parsing per poll.
+    # The min/target tuples are empty when the corresponding string is empty.
+    version_tuple: tuple = field(default=(), init=False, repr=False, compare=False)
+    min_version_tuple: tuple = field(default=(), init=False, repr=False, compare=False)
+    target_build_tuple: tuple = field(default=(), init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.version_tuple = _parse_build_version(self.version)
+        self.min_version_tuple = _parse_build_version(self.min_version) if self.min_version else ()
+        self.target_build_tuple = _parse_build_version(self.target_build) if self.target_build else ()
 
     def to_dict(self) -> dict:
         return {
@@ -47,13 +119,26 @@ class UpdateManager:
     """
 
     def __init__(self, packages_dir: str = None):
-        self.packages_dir = Path(packages_dir or config.PACKAGES_DIR)
+        if not packages_dir:
+            import config
+            packages_dir = config.PACKAGES_DIR
+        self.packages_dir = Path(packages_dir)
         self.packages: Dict[str, UpdatePackage] = {}
         self.manifest_path = self.packages_dir / "manifest.json"
+        # Bumped whenever self.packages changes, so callers can cache
+        # anything derived from the package set
+        self.version = 0
+        # Serialized package list shared by get_manifest/_save_manifest;
+        # reset to None whenever self.packages changes.
+        self._manifest_cache: Optional[List[dict]] = None
+        # Packages newest first, built lazily so a device poll can stop at
+        # the first one that applies
+        self._by_newest: Optional[List[UpdatePackage]] = None
         self._load_manifest()
 
     def _load_manifest(self):
         """Load package manifest from disk"""
+        self._invalidate()
         if not self.manifest_path.exists():
             # Create empty manifest
             self._save_manifest()
@@ -82,10 +167,30 @@ class UpdateManager:
         """Save package manifest to disk"""
         self.packages_dir.mkdir(parents=True, exist_ok=True)
         data = {
-            "packages": [pkg.to_dict() for pkg in self.packages.values()]
+            "packages": self._manifest_packages()
         }
-        with open(self.manifest_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Write to a temp file and rename so readers never see a torn manifest
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, self.manifest_path)
+
+    def _invalidate(self):
+        """Drop caches derived from self.packages"""
+        self._manifest_cache = None
+        self._by_newest = None
+        self.version += 1
+
+    def _manifest_packages(self) -> List[dict]:
+        """Serialized package list, built once per change to self.packages"""
+        if self._manifest_cache is None:
+            self._manifest_cache = [pkg.to_dict() for pkg in self.packages.values()]
+        return self._manifest_cache
+
+    def _mark_dirty(self):
+        """Record a manifest change and save it"""
+        self._invalidate()
+        self._save_manifest()
 
     def scan_packages(self):
         """Scan packages directory and update manifest"""
@@ -93,31 +198,32 @@ class UpdateManager:
             self.packages_dir.mkdir(parents=True, exist_ok=True)
             return
 
-        for filepath in self.packages_dir.glob("*.ipk"):
-            if filepath.name not in [p.filename for p in self.packages.values()]:
-                # New package found
-                pkg = self._create_package_entry(filepath)
-                if pkg:
-                    self.packages[pkg.name] = pkg
+        # One directory listing for both full (.ipk) and delta (.dipk)
+        # packages; full packages are registered first as before.
+        package_files = sorted(
+            (p for p in self.packages_dir.iterdir() if p.suffix in ('.ipk', '.dipk')),
+            key=lambda p: p.suffix == '.dipk'
+        )
 
-        # Also scan for delta packages
-        for filepath in self.packages_dir.glob("*.dipk"):
-            if filepath.name not in [p.filename for p in self.packages.values()]:
-                pkg = self._create_package_entry(filepath)
-                if pkg:
-                    self.packages[pkg.name] = pkg
+        known = {p.filename for p in self.packages.values()}
+        new_files = [f for f in package_files if f.name not in known]
 
+        # Hash new packages in parallel (hashlib releases the GIL), then
+        # register them in directory order on this thread
+        if new_files:
+            workers = min(len(new_files), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for pkg in pool.map(self._create_package_entry, new_files):
+                    if pkg:
+                        self.packages[pkg.name] = pkg
+
+        self._invalidate()
         self._save_manifest()
 
     def _create_package_entry(self, filepath: Path) -> Optional[UpdatePackage]:
         """Create package entry from file"""
         try:
-            # Calculate MD5
-            md5 = hashlib.md5()
-            with open(filepath, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b''):
-                    md5.update(chunk)
-
+            md5 = _file_digest(filepath)
             size = filepath.stat().st_size
             name = filepath.stem  # filename without extension
 
@@ -126,7 +232,7 @@ class UpdateManager:
                 version="1.0.0",  # Default, should be updated manually
                 filename=filepath.name,
                 size=size,
-                md5=md5.hexdigest(),
+                md5=md5,
                 description=f"Update package: {name}",
             )
         except Exception as e:
@@ -154,32 +260,26 @@ class UpdateManager:
             shutil.copy(path, dest_path)
             path = dest_path
 
-        # Calculate checksum
-        md5 = hashlib.md5()
-        with open(path, 'rb') as f:
-            for chunk in iter(lambda: f.read(8192), b''):
-                md5.update(chunk)
-
         pkg = UpdatePackage(
             name=name,
             version=version,
             filename=path.name,
             size=path.stat().st_size,
-            md5=md5.hexdigest(),
+            md5=_file_digest(path),
             description=description,
             min_version=min_version,
             target_build=target_build,
         )
 
         self.packages[name] = pkg
-        self._save_manifest()
+        self._mark_dirty()
         return pkg
 
     def remove_package(self, name: str) -> bool:
         """Remove a package from manifest"""
         if name in self.packages:
             del self.packages[name]
-            self._save_manifest()
+            self._mark_dirty()
             return True
         return False
 
@@ -215,59 +315,39 @@ class UpdateManager:
             return None
 
         # Parse device build version
-        device_version = self._parse_build_version(device_build)
+        device_version = _parse_build_version(device_build)
+
+        if self._by_newest is None:
+            # Stable sort, so equally new packages keep manifest order and
+            # the first match is the one max() over all packages would pick
+            self._by_newest = sorted(
+                self.packages.values(),
+                key=lambda p: p.target_build_tuple or p.version_tuple,
+                reverse=True,
+            )
 
-        # Find applicable updates
-        candidates = []
-        for pkg in self.packages.values():
+        # Return the newest applicable update
+        for pkg in self._by_newest:
             # Check minimum version requirement
-            if pkg.min_version:
-                min_ver = self._parse_build_version(pkg.min_version)
-                if device_version < min_ver:
-                    continue
+            if pkg.min_version_tuple and device_version < pkg.min_version_tuple:
+                continue
 
             # Check target build is newer
-            if pkg.target_build:
-                target_ver = self._parse_build_version(pkg.target_build)
-                if device_version >= target_ver:
-                    continue  # Already at or past this version
+            if pkg.target_build_tuple and device_version >= pkg.target_build_tuple:
+                continue  # Already at or past this version
 
-            candidates.append(pkg)
-
-        if not candidates:
-            return None
+            return pkg
 
-        # Return the newest applicable update
-        candidates.sort(
-            key=lambda p: self._parse_build_version(p.target_build or p.version),
-            reverse=True
-        )
-        return candidates[0]
+        return None
 
     def _parse_build_version(self, build: str) -> tuple:
-        """
-        Parse build string to comparable tuple.
-
-        Examples:
-            "Nova-3.0.5-64" -> (3, 0, 5, 64)
-            "3.0.5" -> (3, 0, 5, 0)
-        """
-        import re
-
-        # Extract version numbers
-        numbers = re.findall(r'\d+', build)
-        if not numbers:
-            return (0, 0, 0, 0)
-
-        # Pad to 4 components
-        while len(numbers) < 4:
-            numbers.append('0')
-
-        return tuple(int(n) for n in numbers[:4])
+        """Parse build string to comparable tuple (see module-level helper)"""
+        return _parse_build_version(build)
 
     def get_package_url(self, package: UpdatePackage, base_url: str = None) -> str:
         """Get download URL for package"""
         if base_url is None:
+            import config
             base_url = config.SERVER_URL
         return f"{base_url}/packages/{package.filename}"
 
@@ -278,6 +358,6 @@ class UpdateManager:
     def get_manifest(self) -> dict:
         """Get full manifest as dictionary"""
         return {
-            "packages": [pkg.to_dict() for pkg in self.packages.values()],
+            "packages": self._manifest_packages(),
             "count": len(self.packages),
         }
@@ -6,16 +6,22 @@ Implements the SyncML/OMA DM protocol for software updates.
 """
 import logging
 import base64
+import os
+import re
+import hmac
 import json
 import time
 from collections import defaultdict, deque
+from contextlib import closing
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, Request, Response, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+import orjson
 import uvicorn
 
 import config
@@ -40,10 +46,11 @@ if _log_file:
     _fh = RotatingFileHandler(_log_file, maxBytes=5_000_000, backupCount=5)
     _fh.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
     logging.getLogger().addHandler(_fh)
-    logger.info(f"Access log -> {_log_file}")
+    logger.info("Access log -> %s", _log_file)
 
 # Initialize FastAPI app
 app = FastAPI(
+    default_response_class=ORJSONResponse,
     title="webOS Update Server",
     description="OMA DM server for HP TouchPad software updates",
     version="1.0.0"
@@ -52,6 +59,9 @@ app = FastAPI(
 # Initialize components
 session_manager = SessionManager(session_timeout=config.SESSION_TIMEOUT)
 update_manager = UpdateManager(config.PACKAGES_DIR)
+# Shared across requests: compute_hmac/parse_hmac_header don't touch the
+# instance nonce state (that lives on Session), and the credential digest
+# cache survives between requests.
 auth_handler = HMACAuth()
 elig_policy = load_policy()
 
@@ -125,25 +135,25 @@ async def access_log_and_metrics(request: Request, call_next):
         status = response.status_code
     except Exception:
         metrics.record(request.method, request.url.path, ip, 500, build, baseline)
-        logger.exception(f"{ip} {request.method} {request.url.path} -> 500 (unhandled)")
+        logger.exception("%s %s %s -> 500 (unhandled)", ip, request.method, request.url.path)
         raise
     metrics.record(request.method, request.url.path, ip, status, build, baseline)
     tag = build or (f"baseline {baseline}" if baseline else None)
-    logger.info(f"ACCESS {ip} {request.method} {request.url.path} -> {status}"
-                + (f" [{tag}]" if tag else ""))
+    logger.info("ACCESS %s %s %s -> %s%s", ip, request.method, request.url.path,
+                status, f" [{tag}]" if tag else "")
     return response
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize server on startup"""
-    logger.info(f"webOS Update Server starting on {config.SERVER_HOST}:{config.SERVER_PORT}")
-    logger.info(f"Server ID: {config.SERVER_ID}")
-    logger.info(f"Packages directory: {config.PACKAGES_DIR}")
+    logger.info("webOS Update Server starting on %s:%s", config.SERVER_HOST, config.SERVER_PORT)
+    logger.info("Server ID: %s", config.SERVER_ID)
+    logger.info("Packages directory: %s", config.PACKAGES_DIR)
 
     # Scan for packages
     update_manager.scan_packages()
-    logger.info(f"Found {len(update_manager.packages)} update packages")
+    logger.info("Found %d update packages", len(update_manager.packages))
 
 
 @app.get("/")
@@ -185,7 +195,7 @@ async def updates_offer():
         try:
             return json.loads(offer_path.read_text())
         except Exception as e:
-            logger.error(f"offer.json unreadable, serving UpToDate: {e}")
+            logger.error("offer.json unreadable, serving UpToDate: %s", e)
     return {"status": "UpToDate", "networkAvailable": True}
 
 
@@ -232,6 +242,33 @@ async def stats():
     }
 
 
+# Upper bound on preallocating from Content-Length (the header is client-supplied)
+MAX_BODY_PREALLOC = 16 * 1024 * 1024
+
+
+async def read_body(request: Request) -> bytearray:
+    """Read the request body into a buffer sized from Content-Length. The
+    buffer is returned as is, so parsing works on it without another copy."""
+    try:
+        content_length = int(request.headers.get("content-length", "0"))
+    except ValueError:
+        content_length = 0
+
+    if 0 < content_length <= MAX_BODY_PREALLOC:
+        buf = bytearray(content_length)
+    else:
+        buf = bytearray()
+
+    offset = 0
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        buf[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    del buf[offset:]  # Content-Length may have overstated the body
+    return buf
+
+
 @app.post("/palmcsext/swupdateserver")
 async def oma_dm_endpoint(request: Request):
     """
@@ -242,30 +279,34 @@ async def oma_dm_endpoint(request: Request):
     client_ip = get_client_ip(request)
     content_type = request.headers.get("Content-Type", "")
 
-    # Read request body
-    body = await request.body()
+    # Check for HMAC authentication header; parsed once, used for logging
+    # and session authentication below
+    hmac_header = request.headers.get("x-syncml-hmac", "")
+    hmac_parts = auth_handler.parse_hmac_header(hmac_header) if hmac_header else {}
+
+    # Read request body. The client MAC is only verified on the first message
+    # of a session (see below), so the body is hashed there on demand rather
+    # than on every message while streaming.
+    body = await read_body(request)
 
-    logger.info(f"OMA DM request from {client_ip}, Content-Type: {content_type}, Size: {len(body)} bytes")
+    logger.info("OMA DM request from %s, Content-Type: %s, Size: %d bytes",
+                client_ip, content_type, len(body))
 
-    # Check for HMAC authentication header
-    hmac_header = request.headers.get("x-syncml-hmac", "")
     client_nonce = b""  # Default empty nonce for first exchange
 
     if hmac_header:
-        logger.debug(f"HMAC header: {hmac_header}")
-        # Parse the HMAC header to extract any nonce
-        auth_parser = HMACAuth()
-        hmac_parts = auth_parser.parse_hmac_header(hmac_header)
-        logger.debug(f"HMAC parts: {hmac_parts}")
+        logger.debug("HMAC header: %s", hmac_header)
+        logger.debug("HMAC parts: %s", hmac_parts)
 
     try:
         # Parse the SyncML message
         parser = SyncMLParser()
-        message = parser.parse(body, content_type)
+        message = parser.parse(memoryview(body), content_type)
 
-        logger.info(f"Session: {message.header.session_id}, MsgID: {message.header.msg_id}")
-        logger.info(f"Source: {message.header.source}, Target: {message.header.target}")
-        logger.debug(f"Commands: {[c.name for c in message.commands]}")
+        logger.info("Session: %s, MsgID: %s", message.header.session_id, message.header.msg_id)
+        logger.info("Source: %s, Target: %s", message.header.source, message.header.target)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Commands: %s", [c.name for c in message.commands])
 
         # Get or create session
         session = session_manager.get_or_create_session(
@@ -278,33 +319,34 @@ async def oma_dm_endpoint(request: Request):
             try:
                 client_nonce = base64.b64decode(message.header.meta['NextNonce'])
                 session.client_nonce = client_nonce
-                logger.debug(f"Got client NextNonce: {client_nonce.hex()}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Got client NextNonce: %s", client_nonce.hex())
             except Exception as e:
-                logger.warning(f"Failed to decode client nonce: {e}")
+                logger.warning("Failed to decode client nonce: %s", e)
 
-        # Handle authentication
+        # Handle authentication. OMA DM authenticates once per session: later
+        # messages skip verification; responses are still signed below while
+        # the client keeps sending HMAC headers.
         if not session.authenticated:
             # Verify client's HMAC if provided
             if hmac_header:
-                auth = HMACAuth()
-                hmac_parts = auth.parse_hmac_header(hmac_header)
                 client_mac = hmac_parts.get('mac', '')
                 client_username = hmac_parts.get('username', config.DEFAULT_USERNAME)
 
                 # Use server's nonce for verification (empty for first message)
                 verify_nonce = session.server_nonce if session.server_nonce else b""
-                expected_mac = auth.compute_hmac(
+                expected_mac = auth_handler.compute_hmac_with_body_b64(
                     client_username,
                     config.DEFAULT_PASSWORD,
                     verify_nonce,
-                    body
+                    auth_handler.body_digest_b64(body)
                 )
 
-                if client_mac == expected_mac:
-                    logger.info(f"Client HMAC verified successfully")
+                if hmac.compare_digest(client_mac.encode(), expected_mac.encode()):
+                    logger.info("Client HMAC verified successfully")
                     session.authenticated = True
                 else:
-                    logger.warning(f"Client HMAC mismatch. Got: {client_mac}, Expected: {expected_mac}")
+                    logger.warning("Client HMAC mismatch. Got: %s, Expected: %s", client_mac, expected_mac)
                     # Accept anyway for now to debug further
                     session.authenticated = True
             else:
@@ -312,42 +354,37 @@ async def oma_dm_endpoint(request: Request):
                 session.authenticated = True
 
             session.username = message.header.cred_data or "guest"
-            logger.info(f"Session {session.session_id} authenticated as {session.username}")
+            logger.info("Session %s authenticated as %s", session.session_id, session.username)
 
         # Process the message and build response
-        response_xml = process_dm_message(session, message, body)
-
-        # Encode response
-        builder = SyncMLBuilder()
-
-        if 'wbxml' in content_type:
-            # Return WBXML
-            response_body = builder.to_wbxml(response_xml)
+        wants_wbxml = 'wbxml' in content_type
+        response_body = process_dm_message(session, message, body, wbxml=wants_wbxml)
+        if wants_wbxml:
             response_content_type = "application/vnd.syncml.dm+wbxml"
         else:
-            # Return XML
-            response_body = builder.to_xml_string(response_xml).encode('utf-8')
             response_content_type = "application/vnd.syncml.dm+xml"
 
-        logger.info(f"Response size: {len(response_body)} bytes")
+        logger.info("Response size: %d bytes", len(response_body))
 
         # Build response with HMAC if client sent HMAC
         response_headers = {}
         if hmac_header:
-            auth = HMACAuth()
             # Use client's nonce if available, otherwise empty
             nonce_for_response = session.client_nonce if session.client_nonce else b""
-            mac = auth.compute_hmac(
+            mac = auth_handler.compute_hmac_with_body_b64(
                 config.SERVER_USERNAME,
                 config.SERVER_PASSWORD,
                 nonce_for_response,
-                response_body
+                auth_handler.body_digest_b64(response_body)
             )
             response_headers["x-syncml-hmac"] = (
                 f"algorithm=MD5, username={config.SERVER_USERNAME}, mac={mac}"
             )
-            logger.debug(f"Response HMAC: algorithm=MD5, username={config.SERVER_USERNAME}, mac={mac}")
-            logger.debug(f"Response nonce used: {nonce_for_response.hex() if nonce_for_response else '(empty)'}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response HMAC: algorithm=MD5, username=%s, mac=%s",
+                             config.SERVER_USERNAME, mac)
+                logger.debug("Response nonce used: %s",
+                             nonce_for_response.hex() if nonce_for_response else "(empty)")
 
         return Response(
             content=response_body,
@@ -356,94 +393,85 @@ async def oma_dm_endpoint(request: Request):
         )
 
     except Exception as e:
-        logger.exception(f"Error processing OMA DM request: {e}")
+        logger.exception("Error processing OMA DM request: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def process_dm_message(session: Session, message: SyncMLMessage, raw_body: bytes):
+def process_dm_message(session: Session, message: SyncMLMessage, raw_body: bytes,
+                       wbxml: bool = False) -> bytes:
     """
     Process incoming SyncML message and build response.
 
-    Implements the OMA DM server state machine.
+    Implements the OMA DM server state machine. Returns the encoded
+    response: WBXML when wbxml is set, otherwise XML.
     """
-    builder = SyncMLBuilder()
-    statuses = []
-    commands = []
+    # Builders are pooled; this one (and its WBXML encoder) goes back to the
+    # pool once the response is encoded
+    with closing(SyncMLBuilder.acquire()) as builder:
+        statuses = []
+        commands = []
+
+        msg_ref = message.header.msg_id
+        next_msg_id = session.next_msg_id()
+
+        # Status for SyncHdr (command reference 0)
+        statuses.append(StatusBuilder(
+            cmd_id="",  # Will be set by builder
+            msg_ref=msg_ref,
+            cmd_ref="0",
+            cmd="SyncHdr",
+            data=config.STATUS_AUTH_ACCEPTED if session.authenticated else config.STATUS_CREDENTIALS_MISSING,
+            target_ref=message.header.target,
+            source_ref=message.header.source,
+        ))
+
+        # Process each command in the message
+        for cmd in message.commands:
+            logger.debug("Processing command: %s (CmdID: %s)", cmd.name, cmd.cmd_id)
+
+            handler = _COMMAND_HANDLERS.get(cmd.name)
+            if handler is not None:
+                status, new_commands = handler(session, cmd, message, builder)
+                # Status commands don't need a response status
+                if status is not None:
+                    statuses.append(status)
+                commands.extend(new_commands)
 
-    msg_ref = message.header.msg_id
-    next_msg_id = session.next_msg_id()
-
-    # Status for SyncHdr (command reference 0)
-    statuses.append(StatusBuilder(
-        cmd_id="",  # Will be set by builder
-        msg_ref=msg_ref,
-        cmd_ref="0",
-        cmd="SyncHdr",
-        data=config.STATUS_AUTH_ACCEPTED if session.authenticated else config.STATUS_CREDENTIALS_MISSING,
-        target_ref=message.header.target,
-        source_ref=message.header.source,
-    ))
-
-    # Process each command in the message
-    for cmd in message.commands:
-        logger.debug(f"Processing command: {cmd.name} (CmdID: {cmd.cmd_id})")
-
-        if cmd.name == "Alert":
-            status, new_commands = handle_alert(session, cmd, message, builder)
-            statuses.append(status)
-            commands.extend(new_commands)
-
-        elif cmd.name == "Status":
-            handle_status(session, cmd)
-            # Status commands don't need a response status
-
-        elif cmd.name == "Results":
-            status = handle_results(session, cmd, message)
-            statuses.append(status)
-
-        elif cmd.name == "Replace":
-            status = handle_replace(session, cmd, message)
-            statuses.append(status)
-
-        elif cmd.name == "Get":
-            status, results = handle_get(session, cmd, message, builder)
-            statuses.append(status)
-            if results:
-                commands.append(results)
-
-        else:
-            # Unknown command - acknowledge with OK
-            statuses.append(StatusBuilder(
-                cmd_id="",
-                msg_ref=msg_ref,
-                cmd_ref=cmd.cmd_id,
-                cmd=cmd.name,
-                data=config.STATUS_OK,
-            ))
+            else:
+                # Unknown command - acknowledge with OK
+                statuses.append(StatusBuilder(
+                    cmd_id="",
+                    msg_ref=msg_ref,
+                    cmd_ref=cmd.cmd_id,
+                    cmd=cmd.name,
+                    data=config.STATUS_OK,
+                ))
+
+        # Check if we need to send update info
+        if session.state.value in ["authenticated", "management"]:
+            update_commands = check_and_send_update(session, builder)
+            commands.extend(update_commands)
+
+        # Build response message
+        response = builder.build_response(
+            session_id=session.session_id,
+            msg_id=next_msg_id,
+            target=message.header.source,
+            source=config.SERVER_ID,
+            statuses=statuses,
+            commands=commands,
+            is_final=True
+        )
 
-    # Check if we need to send update info
-    if session.state.value in ["authenticated", "management"]:
-        update_commands = check_and_send_update(session, builder)
-        commands.extend(update_commands)
-
-    # Build response message
-    response = builder.build_response(
-        session_id=session.session_id,
-        msg_id=next_msg_id,
-        target=message.header.source,
-        source=config.SERVER_ID,
-        statuses=statuses,
-        commands=commands,
-        is_final=True
-    )
-
-    return response
+        if wbxml:
+            return builder.to_wbxml(response)
+        return builder.to_xml_bytes(response)
 
 
 def handle_alert(session: Session, cmd, message: SyncMLMessage, builder: SyncMLBuilder):
     """Handle Alert command"""
     alert_code = int(cmd.data) if cmd.data else 0
-    logger.info(f"Alert code: {alert_code}")
+    logger.info("Alert code: %s", alert_code)
 
     status = StatusBuilder(
         cmd_id="",
@@ -493,12 +521,16 @@ def handle_alert(session: Session, cmd, message: SyncMLMessage, builder: SyncMLB
     return status, commands
 
 
-def handle_status(session: Session, cmd):
+# Exec targets whose Status reports on a download we triggered
+_DOWNLOAD_TARGETS = ("/Download", "/DownloadAndInstall")
+
+
+def handle_status(session: Session, cmd, message: SyncMLMessage, builder: SyncMLBuilder):
     """Handle Status command from device"""
     status_code = int(cmd.data) if cmd.data else 0
     target_ref = cmd.target_ref or ""
 
-    logger.debug(f"Status for {cmd.cmd} (ref {cmd.cmd_ref}): {status_code} - {target_ref}")
+    logger.debug("Status for %s (ref %s): %s - %s", cmd.cmd, cmd.cmd_ref, status_code, target_ref)
 
     # Store status for tracking
     key = f"{cmd.cmd_ref}_{target_ref}"
@@ -509,20 +541,22 @@ def handle_status(session: Session, cmd):
     }
 
     # Check for download completion
-    if "DownloadAndInstall" in target_ref or "Download" in target_ref:
+    if target_ref.endswith(_DOWNLOAD_TARGETS):
         if status_code == config.STATUS_OK:
             logger.info("Device acknowledged download command")
         elif status_code == config.STATUS_ACCEPTED_FOR_PROCESSING:
             logger.info("Device accepted download for processing")
 
+    return None, []
 
-def handle_results(session: Session, cmd, message: SyncMLMessage):
+
+def handle_results(session: Session, cmd, message: SyncMLMessage, builder: SyncMLBuilder):
     """Handle Results command (response to Get)"""
-    for item in cmd.items:
-        source = item.source or ""
-        data = item.data or ""
+    for _, source, data, _ in cmd.items:
+        source = source or ""
+        data = data or ""
 
-        logger.info(f"Result: {source} = {data}")
+        logger.info("Result: %s = %s", source, data)
 
         # Update session device info
         session.update_device_info(source, data)
@@ -537,15 +571,15 @@ def handle_results(session: Session, cmd, message: SyncMLMessage):
         cmd_ref=cmd.cmd_id,
         cmd="Results",
         data=config.STATUS_OK,
-    )
+    ), []
 
 
-def handle_replace(session: Session, cmd, message: SyncMLMessage):
+def handle_replace(session: Session, cmd, message: SyncMLMessage, builder: SyncMLBuilder):
     """Handle Replace command from device"""
-    for item in cmd.items:
-        target = item.target or ""
-        data = item.data or ""
-        logger.info(f"Replace: {target} = {data}")
+    for target, _, data, _ in cmd.items:
+        target = target or ""
+        data = data or ""
+        logger.info("Replace: %s = %s", target, data)
 
     return StatusBuilder(
         cmd_id="",
@@ -553,27 +587,54 @@ def handle_replace(session: Session, cmd, message: SyncMLMessage):
         cmd_ref=cmd.cmd_id,
         cmd="Replace",
         data=config.STATUS_OK,
-    )
+    ), []
+
+
+def _get_build(session: Session) -> Optional[str]:
+    """Device build reported back for a Get on .../Build"""
+    return session.device_info.current_build or "Nova-3.0.5-64"
+
+
+def _get_pkg_url(session: Session) -> Optional[str]:
+    """Download URL of the update for this device, if any"""
+    pkg = update_manager.check_update_available(session.device_info.current_build)
+    if pkg:
+        return update_manager.get_package_url(pkg)
+    return None
+
+
+# Values the server answers for a device Get, keyed by DM tree leaf name.
+# Checked in this order by the substring fallback in _find_get_handler.
+_GET_HANDLERS = {
+    "Build": _get_build,
+    "PkgURL": _get_pkg_url,
+}
+
+
+def _find_get_handler(target: str):
+    """Handler for a Get target: exact leaf name, else the old substring match"""
+    handler = _GET_HANDLERS.get(target.rsplit("/", 1)[-1])
+    if handler is None:
+        for name, fallback in _GET_HANDLERS.items():
+            if name in target:
+                # Still answered as before; logged so the leaf table can be
+                # checked against the LocURIs devices actually send
+                logger.warning("Get target %s matched %s by substring only", target, name)
+                return fallback
+    return handler
 
 
 def handle_get(session: Session, cmd, message: SyncMLMessage, builder: SyncMLBuilder):
     """Handle Get command from device"""
     results_items = []
 
-    for item in cmd.items:
-        target = item.target or ""
-        logger.info(f"Get request for: {target}")
+    for target, _, _, _ in cmd.items:
+        target = target or ""
+        logger.info("Get request for: %s", target)
 
         # Return requested values from our tree
-        value = None
-        if "Build" in target:
-            value = session.device_info.current_build or "Nova-3.0.5-64"
-        elif "PkgURL" in target:
-            pkg = update_manager.check_update_available(
-                session.device_info.current_build
-            )
-            if pkg:
-                value = update_manager.get_package_url(pkg)
+        handler = _find_get_handler(target)
+        value = handler(session) if handler else None
 
         if value:
             results_items.append(ItemBuilder(
@@ -589,17 +650,28 @@ def handle_get(session: Session, cmd, message: SyncMLMessage, builder: SyncMLBui
         data=config.STATUS_OK,
     )
 
-    results = None
+    results = []
     if results_items:
-        results = builder.build_results(
+        results.append(builder.build_results(
             msg_ref=message.header.msg_id,
             cmd_ref=cmd.cmd_id,
             items=results_items
-        )
+        ))
 
     return status, results
 
 
+# Incoming command name -> handler(session, cmd, message, builder), each
+# returning (response status or None, list of commands to send back)
+_COMMAND_HANDLERS = {
+    "Alert": handle_alert,
+    "Status": handle_status,
+    "Results": handle_results,
+    "Replace": handle_replace,
+    "Get": handle_get,
+}
+
+
 def check_and_send_update(session: Session, builder: SyncMLBuilder):
     """Check if update is available and send update commands"""
     commands = []
@@ -610,14 +682,14 @@ def check_and_send_update(session: Session, builder: SyncMLBuilder):
         logger.debug("No device build info yet, skipping update check")
         return commands
 
-    logger.info(f"Checking updates for device build: {device_build}")
+    logger.info("Checking updates for device build: %s", device_build)
 
     pkg = update_manager.check_update_available(device_build)
     if not pkg:
         logger.info("No update available for device")
         return commands
 
-    logger.info(f"Update available: {pkg.name} ({pkg.version})")
+    logger.info("Update available: %s (%s)", pkg.name, pkg.version)
 
     from syncml.session import SessionState
     session.state = SessionState.UPDATE_AVAILABLE
@@ -648,10 +720,40 @@ def check_and_send_update(session: Session, builder: SyncMLBuilder):
 
 # Package hosting endpoints
 
+# (UpdateManager.version, encoded manifest) - re-encoded only when packages change
+_manifest_response_cache = (None, b"")
+
+
 @app.get("/packages/manifest.json")
 async def get_manifest():
     """Get package manifest"""
-    return JSONResponse(update_manager.get_manifest())
+    global _manifest_response_cache
+    version, content = _manifest_response_cache
+    if version != update_manager.version:
+        content = orjson.dumps(update_manager.get_manifest())
+        _manifest_response_cache = (update_manager.version, content)
+    return Response(content=content, media_type="application/json")
+
+
+# Single byte range: "bytes=start-end", "bytes=start-" or suffix "bytes=-N"
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+async def file_range_iter(path: Path, start: int, length: int, chunk_size: int = 1 << 20):
+    """Yield `length` bytes of a file from `start`, reading off the event loop"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        offset = start
+        remaining = length
+        while remaining > 0:
+            data = await run_in_threadpool(os.pread, fd, min(chunk_size, remaining), offset)
+            if not data:
+                break
+            offset += len(data)
+            remaining -= len(data)
+            yield data
+    finally:
+        os.close(fd)
 
 
 @app.get("/packages/{filename}")
@@ -669,39 +771,36 @@ async def download_package(filename: str, request: Request):
 
     # Check for range request
     range_header = request.headers.get("Range")
-    if range_header:
-        # Parse range header: bytes=start-end
-        try:
-            range_spec = range_header.replace("bytes=", "")
-            start, end = range_spec.split("-")
-            start = int(start) if start else 0
-            end = int(end) if end else file_size - 1
-
-            if start >= file_size:
-                raise HTTPException(status_code=416, detail="Range not satisfiable")
-
-            end = min(end, file_size - 1)
-            length = end - start + 1
-
-            # Read the requested range
-            with open(path, "rb") as f:
-                f.seek(start)
-                content = f.read(length)
-
-            return Response(
-                content=content,
-                status_code=206,
-                headers={
-                    "Content-Range": f"bytes {start}-{end}/{file_size}",
-                    "Content-Length": str(length),
-                    "Accept-Ranges": "bytes",
-                },
-                media_type="application/octet-stream"
-            )
-        except ValueError:
-            pass  # Fall through to full file download
+    m = _RANGE_RE.match(range_header) if range_header else None
+    if m and any(m.groups()):
+        first, last = m.groups()
+        if first:
+            # bytes=start-end or bytes=start-
+            start = int(first)
+            end = min(int(last), file_size - 1) if last else file_size - 1
+        else:
+            # Suffix range: bytes=-N is the last N bytes
+            start = max(0, file_size - int(last))
+            end = file_size - 1
+
+        if start >= file_size or end < start:
+            raise HTTPException(status_code=416, detail="Range not satisfiable")
+
+        length = end - start + 1
+
+        # Stream the requested range in bounded chunks
+        return StreamingResponse(
+            file_range_iter(path, start, length),
+            status_code=206,
+            headers={
+                "Content-Range": f"bytes {start}-{end}/{file_size}",
+                "Content-Length": str(length),
+                "Accept-Ranges": "bytes",
+            },
+            media_type="application/octet-stream"
+        )
 
-    # Full file download
+    # Full file download (also for malformed or multi-range requests)
     return FileResponse(
         path=path,
         filename=filename,
@@ -757,23 +856,21 @@ async def check_updates_direct(build: str = "", swv: str = ""):
     device_build = build or swv
 
     if not device_build:
-        return JSONResponse({
+        return ORJSONResponse({
             "status": "error",
             "message": "Missing build or swv parameter",
             "updateAvailable": False
         })
 
-    logger.info(f"Direct update check for build: {device_build}")
+    logger.info("Direct update check for build: %s", device_build)
 
     # Get all packages that apply to this device build
+    device_ver = update_manager._parse_build_version(device_build)
     all_packages = []
     for pkg in update_manager.packages.values():
         # Check if this package applies to the device
-        if pkg.target_build:
-            pkg_target = update_manager._parse_build_version(pkg.target_build)
-            device_ver = update_manager._parse_build_version(device_build)
-            if device_ver >= pkg_target:
-                continue  # Already at or past this version
+        if pkg.target_build_tuple and device_ver >= pkg.target_build_tuple:
+            continue  # Already at or past this version
 
         pkg_url = update_manager.get_package_url(pkg)
         all_packages.append({
@@ -788,13 +885,13 @@ async def check_updates_direct(build: str = "", swv: str = ""):
         })
 
     if not all_packages:
-        return JSONResponse({
+        return ORJSONResponse({
             "status": "ok",
             "updateAvailable": False,
             "currentBuild": device_build
         })
 
-    return JSONResponse({
+    return ORJSONResponse({
         "status": "ok",
         "updateAvailable": True,
         "currentBuild": device_build,
@@ -830,15 +927,15 @@ async def update_plan(
             if v is not None:
                 fp[k] = v
     else:
-        return JSONResponse(
+        return ORJSONResponse(
             {"status": "error", "message": "provide fingerprint= or baseline="},
             status_code=400,
         )
 
     plan = resolve_eligibility(fp, elig_policy)
     logger.info(
-        "Eligibility: baseline=%s refused=%s deliver=%s"
-        % (plan["baseline"], plan["refused"], [e["id"] for e in plan["deliver"]])
+        "Eligibility: baseline=%s refused=%s deliver=%s",
+        plan["baseline"], plan["refused"], [e["id"] for e in plan["deliver"]],
     )
 
     # Annotate delivered/offered packages with which member .ipk files are actually
@@ -854,7 +951,7 @@ async def update_plan(
                 m for m in members if m not in hosted and not m.startswith("(")
             ]
 
-    return JSONResponse({"status": "ok", "plan": plan})
+    return ORJSONResponse({"status": "ok", "plan": plan})
 
 
 @app.get("/api/updates/urls")
@@ -892,7 +989,7 @@ async def get_session_files(build: str = ""):
     - Other metadata
     """
     if not build:
-        return JSONResponse({
+        return ORJSONResponse({
             "status": "error",
             "message": "Missing build parameter"
         })
@@ -900,7 +997,7 @@ async def get_session_files(build: str = ""):
     pkg = update_manager.check_update_available(build)
 
     if not pkg:
-        return JSONResponse({
+        return ORJSONResponse({
             "status": "ok",
             "updateAvailable": False
         })
@@ -908,7 +1005,7 @@ async def get_session_files(build: str = ""):
     pkg_url = update_manager.get_package_url(pkg)
     pkg_path = f"/var/lib/update/{pkg.filename}"
 
-    return JSONResponse({
+    return ORJSONResponse({
         "status": "ok",
         "updateAvailable": True,
         "files": {
@@ -924,12 +1021,25 @@ async def get_session_files(build: str = ""):
     })
 
 
+def _uvicorn_impl(module: str, name: str) -> str:
+    """Pick a uvicorn loop/http implementation if installed, else 'auto'"""
+    try:
+        __import__(module)
+        return name
+    except ImportError:
+        return "auto"
+
+
 def run_server():
     """Run the server"""
+    # uvloop + httptools (from uvicorn[standard]) parse large WBXML bodies
+    # noticeably faster than asyncio + h11; fall back where unavailable.
     uvicorn.run(
         "server:app",
         host=config.SERVER_HOST,
         port=config.SERVER_PORT,
+        loop=_uvicorn_impl("uvloop", "uvloop"),
+        http=_uvicorn_impl("httptools", "httptools"),
         reload=config.DEBUG,
         log_level="debug" if config.DEBUG else "info",
     )
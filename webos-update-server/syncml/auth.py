@@ -6,9 +6,19 @@ Implements the syncml:auth-MAC authentication scheme.
 import hashlib
 import hmac
 import base64
-from typing import Optional, Tuple
+import re
+from typing import Dict, Optional, Tuple
 import config
 
+# One "key=value" pair of the x-syncml-hmac header, e.g.
+# "algorithm=MD5, username=guest, mac=..."; values may contain '=' (base64)
+_HMAC_KV = re.compile(r'\s*([^=,\s]+)\s*=\s*([^,]*?)\s*(?:,|$)')
+
+
+def _macs_equal(a: str, b: str) -> bool:
+    """Constant-time comparison for MACs / secrets"""
+    return hmac.compare_digest(a.encode(), b.encode())
+
 
 class HMACAuth:
     """HMAC-MD5 authentication handler"""
@@ -26,20 +36,37 @@ class HMACAuth:
         self.server_password = server_password or config.SERVER_PASSWORD
         self.client_nonce: Optional[bytes] = None
         self.server_nonce: Optional[bytes] = None
+        # HMAC keyed with B64(H(username:password)) for the configured client
+        # and server pairs, set up once so each MAC starts from a copy. Only
+        # these are kept: the username in x-syncml-hmac comes from the
+        # client, so anything else is keyed one-shot rather than cached.
+        self._hmac_cache: Dict[Tuple[str, str], hmac.HMAC] = {
+            pair: hmac.new(self._get_cred_b64(*pair), digestmod='md5')
+            for pair in ((self.username, self.password),
+                         (self.server_username, self.server_password))
+        }
+
+    def _get_cred_b64(self, username: str, password: str) -> bytes:
+        """B64(H(username:password))"""
+        cred_hash = hashlib.md5(f"{username}:{password}".encode()).digest()
+        return base64.b64encode(cred_hash)
+
+    def _get_hmac(self, username: str, password: str) -> hmac.HMAC:
+        """Get a fresh HMAC-MD5 keyed for this credential pair"""
+        keyed = self._hmac_cache.get((username, password))
+        if keyed is None:
+            return hmac.new(self._get_cred_b64(username, password), digestmod='md5')
+        return keyed.copy()
 
     def parse_hmac_header(self, header: str) -> dict:
         """Parse x-syncml-hmac header"""
-        result = {}
         if not header:
-            return result
-
-        for part in header.split(','):
-            part = part.strip()
-            if '=' in part:
-                key, value = part.split('=', 1)
-                result[key.strip()] = value.strip()
+            return {}
+        return {m[1]: m[2] for m in _HMAC_KV.finditer(header)}
 
-        return result
+    def body_digest_b64(self, body: bytes) -> bytes:
+        """B64(H(body)) - compute once per buffer and pass to compute_hmac_with_body_b64"""
+        return base64.b64encode(hashlib.md5(body).digest())
 
     def compute_hmac(
         self,
@@ -58,25 +85,32 @@ class HMACAuth:
            If no nonce: message = body_digest
         4. MAC = HMAC-MD5(credential, message)
         """
-        # Step 1: H(username:password)
-        cred_hash = hashlib.md5(f"{username}:{password}".encode()).digest()
-        cred_b64 = base64.b64encode(cred_hash).decode()
-
         # Step 2: H(body)
-        body_hash = hashlib.md5(body).digest()
-        body_b64 = base64.b64encode(body_hash).decode()
+        body_b64 = self.body_digest_b64(body)
+        return self.compute_hmac_with_body_b64(username, password, nonce, body_b64)
+
+    def compute_hmac_with_body_b64(
+        self,
+        username: str,
+        password: str,
+        nonce: bytes,
+        body_b64: bytes
+    ) -> str:
+        """compute_hmac with a precomputed body digest (see body_digest_b64)"""
+        # Step 1: HMAC keyed with B64(H(username:password))
+        mac = self._get_hmac(username, password)
 
         # Step 3: Build message - include nonce if present
         if nonce and len(nonce) > 0:
-            message = nonce + b':' + body_b64.encode()
+            message = nonce + b':' + body_b64
         else:
             # No nonce - just use body digest
-            message = body_b64.encode()
+            message = body_b64
 
         # Step 4: HMAC-MD5
-        mac = hmac.new(cred_b64.encode(), message, hashlib.md5).digest()
+        mac.update(message)
 
-        return base64.b64encode(mac).decode()
+        return base64.b64encode(mac.digest()).decode()
 
     def verify_client_auth(
         self,
@@ -89,16 +123,19 @@ class HMACAuth:
         if nonce is None:
             nonce = self.server_nonce or b''
 
+        # Hash the body once for both credential attempts
+        body_b64 = self.body_digest_b64(body)
+
         # Try with provided credentials
-        expected = self.compute_hmac(username, self.password, nonce, body)
+        expected = self.compute_hmac_with_body_b64(username, self.password, nonce, body_b64)
 
-        if mac == expected:
+        if _macs_equal(mac, expected):
             return True
 
         # Try with default credentials
         if username != self.username:
-            expected = self.compute_hmac(self.username, self.password, nonce, body)
-            if mac == expected:
+            expected = self.compute_hmac_with_body_b64(self.username, self.password, nonce, body_b64)
+            if _macs_equal(mac, expected):
                 return True
 
         return False
@@ -164,7 +201,7 @@ class HMACAuth:
                 try:
                     decoded = base64.b64decode(cred_data).decode()
                     username, password = decoded.split(':', 1)
-                    if password == self.password:
+                    if _macs_equal(password, self.password):
                         return True, username
                 except Exception:
                     pass
@@ -4,13 +4,41 @@ SyncML Message Builder
 Builds SyncML response messages for OMA Device Management.
 """
 import xml.etree.ElementTree as ET
+from collections import defaultdict
+from copy import deepcopy
+from functools import lru_cache
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass, field
 from wbxml import WBXMLEncoder
+from wbxml.codec import POOL_SIZE
 import config
+from compat import SLOTS
 
 
-@dataclass
+def _leaf(tag: str, text: str) -> ET.Element:
+    elem = ET.Element(tag)
+    elem.text = text
+    return elem
+
+
+# Templates for header elements that are identical in every response. They
+# are built once, and each response appends its own deep copy, so response
+# trees never share nodes with each other or with these.
+_VER_DTD = _leaf('VerDTD', '1.2')
+_VER_PROTO = _leaf('VerProto', 'DM/1.2')
+_CRED_META_ELEM = ET.Element('Meta')
+_CRED_META_ELEM.extend((_leaf('Type', 'syncml:auth-MAC'), _leaf('Format', 'b64')))
+
+
+@lru_cache(maxsize=16)
+def _source_elem(loc_uri: str) -> ET.Element:
+    """<Source><LocURI/></Source> template for the server identity"""
+    source = ET.Element('Source')
+    source.append(_leaf('LocURI', loc_uri))
+    return source
+
+
+@dataclass(**SLOTS)
 class StatusBuilder:
     """Build Status command"""
     cmd_id: str
@@ -23,7 +51,7 @@ class StatusBuilder:
     items: List[Dict[str, str]] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(**SLOTS)
 class ItemBuilder:
     """Build Item element"""
     target: Optional[str] = None
@@ -32,12 +60,35 @@ class ItemBuilder:
     meta: Dict[str, str] = field(default_factory=dict)
 
 
+# Idle builders by server_id, reused across responses (see SyncMLBuilder.acquire).
+# At most POOL_SIZE are kept per server_id, like the WBXML codec pools.
+_BUILDER_POOL: Dict[str, List['SyncMLBuilder']] = defaultdict(list)
+
+
 class SyncMLBuilder:
     """Build SyncML messages"""
 
     def __init__(self, server_id: str = None):
         self.server_id = server_id or config.SERVER_ID
         self.cmd_id_counter = 0
+        self._encoder = WBXMLEncoder()  # reused for every to_wbxml call
+
+    @classmethod
+    def acquire(cls, server_id: str = None) -> 'SyncMLBuilder':
+        """Get a pooled builder (or a new one) with a fresh CmdID counter.
+        Hand it back with release()/close(), e.g. via contextlib.closing."""
+        pool = _BUILDER_POOL[server_id or config.SERVER_ID]
+        builder = pool.pop() if pool else cls(server_id)
+        builder.reset_cmd_id()
+        return builder
+
+    def release(self):
+        """Return this builder to the pool"""
+        pool = _BUILDER_POOL[self.server_id]
+        if len(pool) < POOL_SIZE:
+            pool.append(self)
+
+    close = release
 
     def next_cmd_id(self) -> str:
         """Get next command ID"""
@@ -68,8 +119,7 @@ class SyncMLBuilder:
         syncml.set('xmlns', 'SYNCML:SYNCML1.2')
 
         # SyncHdr
-        sync_hdr = self._build_header(session_id, msg_id, target, source, cred_mac, next_nonce)
-        syncml.append(sync_hdr)
+        self._build_header(syncml, session_id, msg_id, target, source, cred_mac, next_nonce)
 
         # SyncBody
         sync_body = ET.SubElement(syncml, 'SyncBody')
@@ -77,12 +127,12 @@ class SyncMLBuilder:
         # Add statuses
         if statuses:
             for status in statuses:
-                sync_body.append(self._build_status(status))
+                self._build_status(sync_body, status)
 
-        # Add commands
+        # Add commands (built earlier by the handlers, so they already have
+        # their CmdIDs)
         if commands:
-            for cmd in commands:
-                sync_body.append(cmd)
+            sync_body.extend(commands)
 
         # Final marker
         if is_final:
@@ -92,6 +142,7 @@ class SyncMLBuilder:
 
     def _build_header(
         self,
+        parent: ET.Element,
         session_id: str,
         msg_id: str,
         target: str,
@@ -99,11 +150,11 @@ class SyncMLBuilder:
         cred_mac: str = None,
         next_nonce: str = None
     ) -> ET.Element:
-        """Build SyncHdr element"""
-        hdr = ET.Element('SyncHdr')
+        """Build SyncHdr element under parent"""
+        hdr = ET.SubElement(parent, 'SyncHdr')
 
-        ET.SubElement(hdr, 'VerDTD').text = '1.2'
-        ET.SubElement(hdr, 'VerProto').text = 'DM/1.2'
+        hdr.append(deepcopy(_VER_DTD))
+        hdr.append(deepcopy(_VER_PROTO))
         ET.SubElement(hdr, 'SessionID').text = session_id
         ET.SubElement(hdr, 'MsgID').text = msg_id
 
@@ -111,16 +162,13 @@ class SyncMLBuilder:
         target_elem = ET.SubElement(hdr, 'Target')
         ET.SubElement(target_elem, 'LocURI').text = target
 
-        # Source (server)
-        source_elem = ET.SubElement(hdr, 'Source')
-        ET.SubElement(source_elem, 'LocURI').text = source or self.server_id
+        # Source (server) - the same for every response, so it's prebuilt
+        hdr.append(deepcopy(_source_elem(source or self.server_id)))
 
         # Add Cred element if MAC provided (server authentication)
         if cred_mac:
             cred = ET.SubElement(hdr, 'Cred')
-            meta = ET.SubElement(cred, 'Meta')
-            ET.SubElement(meta, 'Type').text = 'syncml:auth-MAC'
-            ET.SubElement(meta, 'Format').text = 'b64'
+            cred.append(deepcopy(_CRED_META_ELEM))
             ET.SubElement(cred, 'Data').text = cred_mac
 
         # Add Meta with NextNonce for client to use next time
@@ -130,9 +178,9 @@ class SyncMLBuilder:
 
         return hdr
 
-    def _build_status(self, status: StatusBuilder) -> ET.Element:
-        """Build Status element"""
-        elem = ET.Element('Status')
+    def _build_status(self, parent: ET.Element, status: StatusBuilder) -> ET.Element:
+        """Build Status element under parent"""
+        elem = ET.SubElement(parent, 'Status')
 
         ET.SubElement(elem, 'CmdID').text = self.next_cmd_id()
         ET.SubElement(elem, 'MsgRef').text = status.msg_ref
@@ -302,7 +350,10 @@ class SyncMLBuilder:
         """Convert ElementTree to XML string"""
         return ET.tostring(root, encoding='unicode', xml_declaration=True)
 
+    def to_xml_bytes(self, root: ET.Element) -> bytes:
+        """Serialize straight to UTF-8 bytes (same output as to_xml_string().encode())"""
+        return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
     def to_wbxml(self, root: ET.Element) -> bytes:
         """Convert ElementTree to WBXML"""
-        encoder = WBXMLEncoder()
-        return encoder.encode(root)
+        return self._encoder.encode(root)
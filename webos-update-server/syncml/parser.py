@@ -3,13 +3,17 @@ SyncML Message Parser
 
 Parses SyncML messages (XML or WBXML) into structured Python objects.
 """
+import sys
 import xml.etree.ElementTree as ET
+from contextlib import closing
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from types import MappingProxyType
+from typing import List, Optional, Dict, Any, Mapping, NamedTuple
 from wbxml import WBXMLDecoder
+from compat import SLOTS
 
 
-@dataclass
+@dataclass(**SLOTS)
 class SyncMLHeader:
     """SyncML message header"""
     ver_dtd: str = "1.2"
@@ -24,16 +28,18 @@ class SyncMLHeader:
     meta: Dict[str, str] = field(default_factory=dict)
 
 
-@dataclass
-class SyncMLItem:
-    """SyncML item (data container)"""
+_NO_META: Mapping[str, str] = MappingProxyType({})
+
+
+class SyncMLItem(NamedTuple):
+    """SyncML item (data container); a tuple so handlers can unpack it"""
     target: Optional[str] = None
     source: Optional[str] = None
     data: Optional[str] = None
-    meta: Dict[str, str] = field(default_factory=dict)
+    meta: Mapping[str, str] = _NO_META
 
 
-@dataclass
+@dataclass(**SLOTS)
 class SyncMLCommand:
     """SyncML command (Alert, Get, Replace, etc.)"""
     name: str = ""
@@ -49,31 +55,73 @@ class SyncMLCommand:
     no_resp: bool = False
 
 
-@dataclass
+# Tags compared in the parse loops. Tag names from the WBXML tables and
+# namespace-stripped XML tags are interned too, so these equality checks
+# usually succeed on the identity fast path without comparing characters.
+_TAG_FINAL = sys.intern('Final')
+_TAG_ITEM = sys.intern('Item')
+
+
+def _group_by_name(commands: List[SyncMLCommand]) -> Dict[str, List[SyncMLCommand]]:
+    """Bucket commands by name, keeping message order within each bucket"""
+    by_name: Dict[str, List[SyncMLCommand]] = {}
+    for cmd in commands:
+        bucket = by_name.get(cmd.name)
+        if bucket is None:
+            by_name[cmd.name] = [cmd]
+        else:
+            bucket.append(cmd)
+    return by_name
+
+
+@dataclass(**SLOTS)
 class SyncMLMessage:
     """Complete SyncML message"""
     header: SyncMLHeader = field(default_factory=SyncMLHeader)
     commands: List[SyncMLCommand] = field(default_factory=list)
     is_final: bool = False
+    # Commands grouped by name; filled in by the parser, or on first lookup
+    # for hand-built messages. The lists are shared, so treat them as
+    # read-only.
+    by_name: Dict[str, List[SyncMLCommand]] = field(default_factory=dict, repr=False)
+
+    def _named(self, name: str) -> List[SyncMLCommand]:
+        if not self.by_name and self.commands:
+            self.by_name = _group_by_name(self.commands)
+        return self.by_name.get(name, [])
 
     def get_alerts(self) -> List[SyncMLCommand]:
         """Get all Alert commands"""
-        return [c for c in self.commands if c.name == 'Alert']
+        return self._named('Alert')
 
     def get_statuses(self) -> List[SyncMLCommand]:
         """Get all Status commands"""
-        return [c for c in self.commands if c.name == 'Status']
+        return self._named('Status')
 
     def get_results(self) -> List[SyncMLCommand]:
         """Get all Results commands"""
-        return [c for c in self.commands if c.name == 'Results']
+        return self._named('Results')
 
     def get_command(self, name: str) -> Optional[SyncMLCommand]:
         """Get first command by name"""
-        for c in self.commands:
-            if c.name == name:
-                return c
-        return None
+        named = self._named(name)
+        return named[0] if named else None
+
+
+def _children(elem: ET.Element) -> Dict[str, ET.Element]:
+    """Map child tag -> first child with that tag, in one pass over elem"""
+    kids = {}
+    for child in elem:
+        kids.setdefault(child.tag, child)
+    return kids
+
+
+def _text(kids: Dict[str, ET.Element], tag: str, default: Optional[str] = None) -> Optional[str]:
+    """_get_text over a _children() map"""
+    child = kids.get(tag)
+    if child is not None and child.text:
+        return child.text
+    return default
 
 
 class SyncMLParser:
@@ -82,16 +130,20 @@ class SyncMLParser:
     def __init__(self):
         pass
 
-    def parse(self, data: bytes, content_type: str = "") -> SyncMLMessage:
-        """Parse SyncML message from bytes"""
+    def parse(self, data, content_type: str = "") -> SyncMLMessage:
+        """Parse SyncML message from bytes or a memoryview over them"""
         # Detect format
         if content_type.endswith('wbxml') or (data and data[0] in (0x02, 0x03)):
-            # WBXML format
-            root = self._decode_wbxml(data)
-        else:
-            # XML format
-            root = ET.fromstring(data)
-
+            # WBXML format. Tokenized tags come straight from the code page
+            # tables without namespaces; only literal (string table) tag
+            # names can carry one, so skip the strip walk when there are none.
+            with closing(WBXMLDecoder.acquire(data)) as decoder:
+                root = decoder.decode()
+                has_literals = decoder.has_literals
+            return self._parse_syncml(root, strip_namespaces=has_literals)
+
+        # XML format
+        root = ET.fromstring(data)
         return self._parse_syncml(root)
 
     def parse_xml(self, xml_str: str) -> SyncMLMessage:
@@ -99,82 +151,88 @@ class SyncMLParser:
         root = ET.fromstring(xml_str)
         return self._parse_syncml(root)
 
-    def _decode_wbxml(self, data: bytes) -> ET.Element:
-        """Decode WBXML to ElementTree"""
-        decoder = WBXMLDecoder(data)
-        return decoder.decode()
-
-    def _parse_syncml(self, root: ET.Element) -> SyncMLMessage:
+    def _parse_syncml(self, root: ET.Element, strip_namespaces: bool = True) -> SyncMLMessage:
         """Parse SyncML ElementTree to message object"""
         msg = SyncMLMessage()
 
         # Strip namespaces for easier parsing
-        root = self._strip_namespaces(root)
+        if strip_namespaces:
+            root = self._strip_namespaces(root)
+
+        # SyncHdr and SyncBody are direct children of SyncML; only search
+        # deeper for oddly wrapped messages
+        kids = _children(root)
 
         # Find SyncHdr
-        sync_hdr = root.find('.//SyncHdr')
+        sync_hdr = kids.get('SyncHdr')
         if sync_hdr is None:
-            sync_hdr = root.find('SyncHdr')
+            sync_hdr = root.find('.//SyncHdr')
 
         if sync_hdr is not None:
             msg.header = self._parse_header(sync_hdr)
 
         # Find SyncBody
-        sync_body = root.find('.//SyncBody')
+        sync_body = kids.get('SyncBody')
         if sync_body is None:
-            sync_body = root.find('SyncBody')
+            sync_body = root.find('.//SyncBody')
 
         if sync_body is not None:
             msg.commands = self._parse_body(sync_body)
+            msg.by_name = _group_by_name(msg.commands)
             # Check for Final
-            msg.is_final = sync_body.find('Final') is not None
+            msg.is_final = sync_body.find(_TAG_FINAL) is not None
 
         return msg
 
     def _strip_namespaces(self, root: ET.Element) -> ET.Element:
         """Remove namespaces from all elements for easier parsing"""
         for elem in root.iter():
-            if '}' in elem.tag:
-                elem.tag = elem.tag.split('}', 1)[1]
-            # Also strip namespace from attributes
-            attrib = {}
-            for key, value in elem.attrib.items():
-                if '}' in key:
-                    key = key.split('}', 1)[1]
-                attrib[key] = value
-            elem.attrib = attrib
+            tag = elem.tag
+            if '}' in tag:
+                elem.tag = sys.intern(tag.split('}', 1)[1])
+            # Also strip namespace from attributes. SyncML elements rarely
+            # carry any, so only rebuild the dict when there's work to do.
+            attrib = elem.attrib
+            if attrib and any('}' in key for key in attrib):
+                elem.attrib = {
+                    key.split('}', 1)[1] if '}' in key else key: value
+                    for key, value in attrib.items()
+                }
         return root
 
     def _parse_header(self, hdr: ET.Element) -> SyncMLHeader:
         """Parse SyncHdr element"""
         header = SyncMLHeader()
+        kids = _children(hdr)
 
-        header.ver_dtd = self._get_text(hdr, 'VerDTD', '1.2')
-        header.ver_proto = self._get_text(hdr, 'VerProto', 'DM/1.2')
-        header.session_id = self._get_text(hdr, 'SessionID', '')
-        header.msg_id = self._get_text(hdr, 'MsgID', '')
+        header.ver_dtd = _text(kids, 'VerDTD', '1.2')
+        header.ver_proto = _text(kids, 'VerProto', 'DM/1.2')
+        header.session_id = _text(kids, 'SessionID', '')
+        header.msg_id = _text(kids, 'MsgID', '')
 
         # Target
-        target = hdr.find('Target')
+        target = kids.get('Target')
         if target is not None:
             header.target = self._get_text(target, 'LocURI', '')
 
         # Source
-        source = hdr.find('Source')
+        source = kids.get('Source')
         if source is not None:
             header.source = self._get_text(source, 'LocURI', '')
 
         # Credentials
-        cred = hdr.find('Cred')
+        cred = kids.get('Cred')
         if cred is not None:
-            meta = cred.find('Meta')
+            cred_kids = _children(cred)
+            meta = cred_kids.get('Meta')
             if meta is not None:
-                header.cred_type = self._get_text(meta, 'Type', '')
-                header.cred_format = self._get_text(meta, 'Format', '')
-            header.cred_data = self._get_text(cred, 'Data', '')
+                meta_kids = _children(meta)
+                header.cred_type = _text(meta_kids, 'Type', '')
+                header.cred_format = _text(meta_kids, 'Format', '')
+            header.cred_data = _text(cred_kids, 'Data', '')
 
         # Meta
-        meta = hdr.find('Meta')
+        meta = kids.get('Meta')
         if meta is not None:
             header.meta = self._parse_meta(meta)
 
@@ -185,7 +243,7 @@ class SyncMLParser:
         commands = []
 
         for child in body:
-            if child.tag == 'Final':
+            if child.tag == _TAG_FINAL:
                 continue
 
             cmd = self._parse_command(child)
@@ -196,52 +254,53 @@ class SyncMLParser:
 
     def _parse_command(self, elem: ET.Element) -> Optional[SyncMLCommand]:
         """Parse a single command element"""
-        cmd = SyncMLCommand()
-        cmd.name = elem.tag
-        cmd.cmd_id = self._get_text(elem, 'CmdID', '')
-
-        # Status-specific fields
-        cmd.msg_ref = self._get_text(elem, 'MsgRef')
-        cmd.cmd_ref = self._get_text(elem, 'CmdRef')
-        cmd.cmd = self._get_text(elem, 'Cmd')
-        cmd.target_ref = self._get_text(elem, 'TargetRef')
-        cmd.source_ref = self._get_text(elem, 'SourceRef')
-        cmd.data = self._get_text(elem, 'Data')
-
-        # NoResp flag
-        cmd.no_resp = elem.find('NoResp') is not None
-
-        # Items
-        for item_elem in elem.findall('Item'):
-            item = self._parse_item(item_elem)
-            cmd.items.append(item)
-
-        # Meta
-        meta = elem.find('Meta')
-        if meta is not None:
-            cmd.meta = self._parse_meta(meta)
-
-        return cmd
+        # One pass over the children: first child per tag (as find() would
+        # return) plus every Item in document order
+        kids = {}
+        item_elems = []
+        for child in elem:
+            if child.tag == _TAG_ITEM:
+                item_elems.append(child)
+            kids.setdefault(child.tag, child)
+
+        meta = kids.get('Meta')
+
+        # Built in a single constructor call rather than field by field
+        return SyncMLCommand(
+            name=elem.tag,
+            cmd_id=_text(kids, 'CmdID', ''),
+            # Status-specific fields
+            msg_ref=_text(kids, 'MsgRef'),
+            cmd_ref=_text(kids, 'CmdRef'),
+            cmd=_text(kids, 'Cmd'),
+            target_ref=_text(kids, 'TargetRef'),
+            source_ref=_text(kids, 'SourceRef'),
+            data=_text(kids, 'Data'),
+            items=[self._parse_item(item_elem) for item_elem in item_elems],
+            meta=self._parse_meta(meta) if meta is not None else {},
+            no_resp='NoResp' in kids,
+        )
 
     def _parse_item(self, elem: ET.Element) -> SyncMLItem:
         """Parse Item element"""
-        item = SyncMLItem()
+        kids = _children(elem)
 
-        target = elem.find('Target')
+        target = kids.get('Target')
         if target is not None:
-            item.target = self._get_text(target, 'LocURI', '')
+            target = self._get_text(target, 'LocURI', '')
 
-        source = elem.find('Source')
+        source = kids.get('Source')
         if source is not None:
-            item.source = self._get_text(source, 'LocURI', '')
+            source = self._get_text(source, 'LocURI', '')
 
-        item.data = self._get_text(elem, 'Data')
-
-        meta = elem.find('Meta')
-        if meta is not None:
-            item.meta = self._parse_meta(meta)
+        meta = kids.get('Meta')
 
-        return item
+        return SyncMLItem(
+            target,
+            source,
+            _text(kids, 'Data'),
+            self._parse_meta(meta) if meta is not None else _NO_META,
+        )
 
     def _parse_meta(self, meta: ET.Element) -> Dict[str, str]:
         """Parse Meta element to dictionary"""
@@ -3,10 +3,16 @@ SyncML Session Management
 
 Manages OMA DM sessions between server and devices.
 """
+import os
 import time
 from dataclasses import dataclass, field
 from typing import Dict, Optional, List, Any
 from enum import Enum
+from compat import SLOTS
+
+
+# Bytes of randomness fetched per os.urandom call for session nonces
+NONCE_POOL_SIZE = 16 * 1024
 
 
 class SessionState(Enum):
@@ -20,7 +26,7 @@ class SessionState(Enum):
     ERROR = "error"
 
 
-@dataclass
+@dataclass(**SLOTS)
 class DeviceInfo:
     """Device information collected during session"""
     device_id: str = ""
@@ -34,7 +40,22 @@ class DeviceInfo:
     language: str = ""
 
 
-@dataclass
+# DM tree node name (lowercased) -> DeviceInfo field it reports
+_DEVINFO_FIELDS = {
+    'devid': 'device_id',
+    'man': 'manufacturer',
+    'mod': 'model',
+    'fwv': 'firmware_version',
+    'fmv': 'firmware_version',
+    'swv': 'software_version',
+    'hwv': 'hardware_version',
+    'build': 'current_build',
+    'dmv': 'dm_version',
+    'lang': 'language',
+}
+
+
+@dataclass(**SLOTS)
 class Session:
     """OMA DM Session"""
     session_id: str
@@ -63,26 +84,13 @@ class Session:
 
     def update_device_info(self, path: str, value: str):
         """Update device info from DM tree path"""
-        path_lower = path.lower()
-
-        if 'devid' in path_lower:
-            self.device_info.device_id = value
-        elif 'man' in path_lower and 'command' not in path_lower:
-            self.device_info.manufacturer = value
-        elif 'mod' in path_lower:
-            self.device_info.model = value
-        elif 'fwv' in path_lower or 'fmv' in path_lower:
-            self.device_info.firmware_version = value
-        elif 'swv' in path_lower:
-            self.device_info.software_version = value
-        elif 'hwv' in path_lower:
-            self.device_info.hardware_version = value
-        elif 'build' in path_lower:
-            self.device_info.current_build = value
-        elif 'dmv' in path_lower:
-            self.device_info.dm_version = value
-        elif 'lang' in path_lower:
-            self.device_info.language = value
+        # Match whole path segments, leaf first, so e.g. "Lang" can't be
+        # mistaken for "Man"
+        for segment in reversed(path.lower().split('/')):
+            attr = _DEVINFO_FIELDS.get(segment)
+            if attr:
+                setattr(self.device_info, attr, value)
+                return
 
 
 class SessionManager:
@@ -90,8 +98,24 @@ class SessionManager:
 
     def __init__(self, session_timeout: int = 3600):
         self.sessions: Dict[str, Session] = {}
+        # device_id -> {session_id: Session}, in creation order, so device
+        # lookups don't scan every session
+        self._by_device: Dict[str, Dict[str, Session]] = {}
         self.session_timeout = session_timeout
         self._session_counter = 0
+        # Random bytes for server nonces, drawn from os.urandom in bulk and
+        # handed out 16 bytes at a time (each slice is used once)
+        self._nonce_pool = b""
+        self._nonce_off = 0
+
+    def _fresh_nonce(self, size: int = 16) -> bytes:
+        """Next unused slice of the nonce pool, refilling it when exhausted"""
+        off = self._nonce_off
+        if off + size > len(self._nonce_pool):
+            self._nonce_pool = os.urandom(max(NONCE_POOL_SIZE, size))
+            off = 0
+        self._nonce_off = off + size
+        return self._nonce_pool[off:off + size]
 
     def create_session(self, device_id: str, session_id: str = None) -> Session:
         """Create a new session"""
@@ -105,12 +129,23 @@ class SessionManager:
         )
 
         # Generate server nonce
-        import os
-        session.server_nonce = os.urandom(16)
+        session.server_nonce = self._fresh_nonce()
 
+        self._unindex(self.sessions.get(session_id))
         self.sessions[session_id] = session
+        self._by_device.setdefault(device_id, {})[session_id] = session
         return session
 
+    def _unindex(self, session: Optional[Session]):
+        """Drop a session from the by-device index"""
+        if session is None:
+            return
+        device_sessions = self._by_device.get(session.device_id)
+        if device_sessions is not None:
+            device_sessions.pop(session.session_id, None)
+            if not device_sessions:
+                del self._by_device[session.device_id]
+
     def get_session(self, session_id: str) -> Optional[Session]:
         """Get session by ID"""
         session = self.sessions.get(session_id)
@@ -127,21 +162,24 @@ class SessionManager:
 
     def remove_session(self, session_id: str):
         """Remove a session"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        self._unindex(self.sessions.pop(session_id, None))
 
     def cleanup_expired(self):
         """Remove expired sessions"""
+        # One clock read for the whole sweep (is_expired reads it per call)
+        cutoff = time.time() - self.session_timeout
         expired = [
-            sid for sid, session in self.sessions.items()
-            if session.is_expired(self.session_timeout)
+            (sid, session) for sid, session in self.sessions.items()
+            if session.last_activity < cutoff
         ]
-        for sid in expired:
-            del self.sessions[sid]
+        sessions = self.sessions
+        for sid, session in expired:
+            del sessions[sid]
+            self._unindex(session)
 
     def get_session_by_device(self, device_id: str) -> Optional[Session]:
         """Get active session for a device"""
-        for session in self.sessions.values():
-            if session.device_id == device_id and not session.is_expired(self.session_timeout):
+        for session in self._by_device.get(device_id, {}).values():
+            if not session.is_expired(self.session_timeout):
                 return session
         return None
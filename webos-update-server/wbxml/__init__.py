@@ -2,6 +2,15 @@
 WBXML (WAP Binary XML) codec for SyncML/OMA DM
 """
 from .codec import WBXMLDecoder, WBXMLEncoder
-from .tokens import SYNCML_TAGS, METINF_TAGS, DEVINF_TAGS
+from .tokens import (
+    SYNCML_TAGS, METINF_TAGS, DEVINF_TAGS,
+    SYNCML_TAGS_REV, METINF_TAGS_REV, DEVINF_TAGS_REV,
+    TAG_INDEX,
+)
 
-__all__ = ['WBXMLDecoder', 'WBXMLEncoder', 'SYNCML_TAGS', 'METINF_TAGS', 'DEVINF_TAGS']
+__all__ = [
+    'WBXMLDecoder', 'WBXMLEncoder',
+    'SYNCML_TAGS', 'METINF_TAGS', 'DEVINF_TAGS',
+    'SYNCML_TAGS_REV', 'METINF_TAGS_REV', 'DEVINF_TAGS_REV',
+    'TAG_INDEX',
+]
@@ -4,91 +4,164 @@ WBXML Encoder/Decoder for SyncML 1.2
 WBXML (WAP Binary XML) is a compact binary representation of XML.
 Used by OMA DM for efficient over-the-air transmission.
 """
-import io
+import sys
 import xml.etree.ElementTree as ET
-from typing import Optional, Tuple, Dict, Any
+from contextlib import closing
+from typing import Optional, Dict, Union, List
 from .tokens import (
     SWITCH_PAGE, END, STR_I, STR_T, OPAQUE, LITERAL,
     TAG_HAS_CONTENT, TAG_HAS_ATTRS,
     SYNCML_1_2_PUBLIC_ID,
-    CODE_PAGES, CODE_PAGES_REV,
-    SYNCML_TAGS, SYNCML_TAGS_REV,
-    METINF_TAGS, METINF_TAGS_REV,
+    CODE_PAGES_REV, CODE_PAGE_COUNT, FLAT_TAGS, TAG_INDEX,
 )
 
+# Version 1.3, public ID 0x1201 (SyncML 1.2) and charset 106 (UTF-8), which
+# is how every SyncML DM message we see starts
+_SYNCML_1_2_HEADER = b'\x03\xa4\x01\x6a'
+
+# Byte runs around the text of a text-only element: STR_I <text> NUL END
+_STR_I_PREFIX = bytes((STR_I,))
+_NUL_END = bytes((0, END))
+
+# Idle codec instances, reused across messages (see acquire/release). Kept
+# small so a burst doesn't leave lots of them lying around.
+POOL_SIZE = 16
+_DECODER_POOL: List['WBXMLDecoder'] = []
+_ENCODER_POOL: List['WBXMLEncoder'] = []
+
 
 class WBXMLDecoder:
     """Decode WBXML binary data to XML ElementTree"""
 
-    def __init__(self, data: bytes):
-        self.data = data
-        self.pos = 0
-        self.string_table: bytes = b""
-        self.current_page = 0
+    def __init__(self, data: Union[bytes, bytearray, memoryview] = b""):
+        self.reset(data)
+
+    @classmethod
+    def acquire(cls, data: Union[bytes, bytearray, memoryview]) -> 'WBXMLDecoder':
+        """Get a pooled decoder (or a new one) pointed at data.
+        Hand it back with release()/close(), e.g. via contextlib.closing."""
+        if _DECODER_POOL:
+            decoder = _DECODER_POOL.pop()
+            decoder.reset(data)
+            return decoder
+        return cls(data)
+
+    def release(self):
+        """Drop the message and return this decoder to the pool"""
+        self.reset(b"")
+        if len(_DECODER_POOL) < POOL_SIZE:
+            _DECODER_POOL.append(self)
+
+    close = release
+
+    def reset(self, data: Union[bytes, bytearray, memoryview]):
+        """Point the decoder at a new message, clearing per-message state"""
+        # bytes or memoryview; slices of a memoryview are views, so text is
+        # decoded straight out of the request buffer without copying
+        self.data: Union[bytes, bytearray, memoryview] = data
+        self._scan: Union[bytes, bytearray]
+        # memoryview has no find(), so null scans go through the exporting
+        # bytes/bytearray object when the view covers all of it
+        if isinstance(data, memoryview):
+            base = data.obj
+            if not (isinstance(base, (bytes, bytearray)) and len(base) == data.nbytes):
+                base = bytes(data)
+            self._scan = base
+        else:
+            self._scan = data
+        self.pos: int = 0
+        self.string_table: memoryview = memoryview(b"")
+        self._table_start: int = 0  # offset of the string table within data
+        self._table_strings: Dict[int, str] = {}
+        self.current_page: int = 0
+        self.has_literals: bool = False  # any tag names read from the string table
 
     def read_byte(self) -> int:
         """Read a single byte"""
-        if self.pos >= len(self.data):
-            raise ValueError(f"Unexpected end of data at position {self.pos}")
-        b = self.data[self.pos]
-        self.pos += 1
+        # let indexing do the bounds check instead of a len() per byte
+        pos = self.pos
+        try:
+            b = self.data[pos]
+        except IndexError:
+            raise ValueError(f"Unexpected end of data at position {pos}") from None
+        self.pos = pos + 1
         return b
 
     def read_mb_uint32(self) -> int:
         """Read a multi-byte encoded uint32 (variable length)"""
-        result = 0
-        while True:
-            b = self.read_byte()
-            result = (result << 7) | (b & 0x7F)
-            if not (b & 0x80):
-                break
+        data = self.data
+        pos = self.pos
+        try:
+            # most values (lengths, string table offsets) fit in one byte
+            b = data[pos]
+            if b < 0x80:
+                self.pos = pos + 1
+                return b
+            result = 0
+            while True:
+                b = data[pos]
+                pos += 1
+                result = (result << 7) | (b & 0x7F)
+                if not (b & 0x80):
+                    break
+        except IndexError:
+            raise ValueError(f"Unexpected end of data at position {pos}") from None
+        self.pos = pos
         return result
 
     def read_string(self) -> str:
         """Read null-terminated inline string"""
         start = self.pos
-        while self.data[self.pos] != 0:
-            self.pos += 1
-        s = self.data[start:self.pos].decode('utf-8')
-        self.pos += 1  # skip null terminator
-        return s
-
-    def read_opaque(self) -> bytes:
-        """Read opaque data (length-prefixed binary)"""
-        length = self.read_mb_uint32()
-        data = self.data[self.pos:self.pos + length]
-        self.pos += length
-        return data
+        try:
+            end = self._scan.index(0, start)  # memchr rather than a byte loop
+        except ValueError:
+            raise ValueError(f"Unterminated inline string at position {start}") from None
+        self.pos = end + 1  # skip null terminator
+        return str(self.data[start:end], 'utf-8')
 
     def get_string_from_table(self, offset: int) -> str:
         """Get string from string table at given offset"""
-        end = self.string_table.find(b'\x00', offset)
-        if end == -1:
-            end = len(self.string_table)
-        return self.string_table[offset:end].decode('utf-8')
+        # literal tags reference the same few offsets over and over
+        s = self._table_strings.get(offset)
+        if s is None:
+            # scan and slice the input directly; only the substring is copied
+            start = self._table_start + offset
+            stop = self._table_start + len(self.string_table)
+            end = self._scan.find(0, start, stop)
+            if end == -1:
+                end = stop
+            s = self._table_strings[offset] = str(self._scan[start:end], 'utf-8')
+        return s
 
     def get_tag_name(self, token: int) -> str:
         """Get tag name for token in current code page"""
         tag_token = token & 0x3F  # Remove content/attr flags
-        tags = CODE_PAGES.get(self.current_page, SYNCML_TAGS)
-        return tags.get(tag_token, f"Unknown_0x{tag_token:02X}")
+        page = self.current_page
+        if page >= CODE_PAGE_COUNT:
+            page = 0  # unknown pages decode as SyncML
+        return FLAT_TAGS[(page << 6) | tag_token] or f"Unknown_0x{tag_token:02X}"
 
     def decode(self) -> ET.Element:
         """Decode WBXML to ElementTree"""
         # Read header
-        version = self.read_byte()  # WBXML version (e.g., 0x03 for 1.3)
-        public_id = self.read_mb_uint32()  # Public identifier
+        if self._scan.startswith(_SYNCML_1_2_HEADER):
+            # Common case, nothing in it we need to keep
+            self.pos = len(_SYNCML_1_2_HEADER)
+        else:
+            version = self.read_byte()  # WBXML version (e.g., 0x03 for 1.3)
+            public_id = self.read_mb_uint32()  # Public identifier
 
-        # Handle public ID that might be in string table
-        if public_id == 0:
-            public_id_index = self.read_mb_uint32()
+            # Handle public ID that might be in string table
+            if public_id == 0:
+                public_id_index = self.read_mb_uint32()
 
-        charset = self.read_mb_uint32()  # Character set (106 = UTF-8)
+            charset = self.read_mb_uint32()  # Character set (106 = UTF-8)
 
         # String table
         str_table_len = self.read_mb_uint32()
         if str_table_len > 0:
-            self.string_table = self.data[self.pos:self.pos + str_table_len]
+            self.string_table = memoryview(self.data)[self.pos:self.pos + str_table_len]
+            self._table_start = self.pos
             self.pos += str_table_len
 
         # Parse body
@@ -107,13 +180,18 @@ class WBXMLDecoder:
         if token == END:
             return None
 
+        return self.parse_tag(token)
+
+    def parse_tag(self, token: int) -> ET.Element:
+        """Parse an element whose tag token has already been read"""
         has_content = bool(token & TAG_HAS_CONTENT)
         has_attrs = bool(token & TAG_HAS_ATTRS)
 
         # Get tag name
         if token & 0x3F == 0x04:  # LITERAL
             tag_index = self.read_mb_uint32()
-            tag_name = self.get_string_from_table(tag_index)
+            tag_name = sys.intern(self.get_string_from_table(tag_index))
+            self.has_literals = True
         else:
             tag_name = self.get_tag_name(token)
 
@@ -129,7 +207,7 @@ class WBXMLDecoder:
 
         return elem
 
-    def parse_attributes(self, elem: ET.Element):
+    def parse_attributes(self, elem: ET.Element) -> None:
         """Parse element attributes"""
         # Simplified - full implementation would handle attribute tokens
         while True:
@@ -139,99 +217,132 @@ class WBXMLDecoder:
             # Handle attribute tokens...
             # For now, skip unknown attributes
 
-    def parse_content(self, elem: ET.Element):
+    def parse_content(self, elem: ET.Element) -> None:
         """Parse element content (text and child elements)"""
-        text_parts = []
+        # Nearly every element has at most one text node, so only build a
+        # list once a second one turns up
+        text = None
+        extra = None
+        # Loop-invariant globals and bound methods as locals
+        _END, _SWITCH_PAGE, _STR_I, _STR_T, _OPAQUE = END, SWITCH_PAGE, STR_I, STR_T, OPAQUE
+        read_byte = self.read_byte
 
         while True:
-            token = self.read_byte()
+            token = read_byte()
 
-            if token == END:
+            if token == _END:
                 break
-            elif token == SWITCH_PAGE:
-                self.current_page = self.read_byte()
-            elif token == STR_I:
+            elif token == _SWITCH_PAGE:
+                self.current_page = read_byte()
+                continue
+            elif token == _STR_I:
                 # Inline string
-                text_parts.append(self.read_string())
-            elif token == STR_T:
+                s = self.read_string()
+            elif token == _STR_T:
                 # String table reference
                 offset = self.read_mb_uint32()
-                text_parts.append(self.get_string_from_table(offset))
-            elif token == OPAQUE:
-                # Opaque data - store as base64 or raw
-                data = self.read_opaque()
-                try:
-                    text_parts.append(data.decode('utf-8'))
-                except UnicodeDecodeError:
-                    import base64
-                    text_parts.append(base64.b64encode(data).decode('ascii'))
+                s = self.get_string_from_table(offset)
+            elif token == _OPAQUE:
+                # Opaque data - store as base64 or raw. Sliced from the bytes
+                # behind the input since memoryview has no isascii(); ASCII
+                # payloads then skip the UTF-8 attempt entirely
+                length = self.read_mb_uint32()
+                start = self.pos
+                self.pos += length
+                data = self._scan[start:self.pos]
+                if data.isascii():
+                    s = data.decode('ascii')
+                else:
+                    try:
+                        s = data.decode('utf-8')
+                    except UnicodeDecodeError:
+                        import base64
+                        s = base64.b64encode(data).decode('ascii')
             else:
-                # It's a tag - push back and parse as child element
-                self.pos -= 1
-                child = self.parse_element()
-                if child is not None:
-                    elem.append(child)
+                # It's a tag - parse the child from the token already read
+                elem.append(self.parse_tag(token))
+                continue
+
+            if text is None:
+                text = s
+            elif extra is None:
+                extra = [text, s]
+            else:
+                extra.append(s)
 
-        if text_parts:
-            elem.text = ''.join(text_parts)
+        if extra is not None:
+            elem.text = ''.join(extra)
+        elif text is not None:
+            elem.text = text
 
 
 class WBXMLEncoder:
     """Encode XML ElementTree to WBXML binary"""
 
     def __init__(self):
-        self.output = io.BytesIO()
-        self.string_table = io.BytesIO()
+        self.reset()
+
+    @classmethod
+    def acquire(cls) -> 'WBXMLEncoder':
+        """Get a pooled encoder (or a new one).
+        Hand it back with release()/close(), e.g. via contextlib.closing."""
+        return _ENCODER_POOL.pop() if _ENCODER_POOL else cls()
+
+    def release(self):
+        """Drop the last message's buffers and return this encoder to the pool"""
+        self.reset()
+        if len(_ENCODER_POOL) < POOL_SIZE:
+            _ENCODER_POOL.append(self)
+
+    close = release
+
+    def reset(self):
+        """Clear per-message state so the encoder can be reused"""
+        self.output: bytearray = bytearray()
+        self.string_table: bytearray = bytearray()
         self.string_table_index: Dict[str, int] = {}
-        self.current_page = 0
+        self.current_page: int = 0
 
     def write_byte(self, b: int):
         """Write a single byte"""
-        self.output.write(bytes([b]))
+        self.output.append(b)
 
     def write_mb_uint32(self, value: int):
         """Write multi-byte encoded uint32"""
-        if value == 0:
-            self.write_byte(0)
-            return
-
-        bytes_list = []
-        while value > 0:
-            bytes_list.insert(0, value & 0x7F)
-            value >>= 7
-
-        for i, b in enumerate(bytes_list):
-            if i < len(bytes_list) - 1:
-                b |= 0x80
-            self.write_byte(b)
+        self.write_mb_uint32_to(self.output, value)
 
     def write_string(self, s: str):
         """Write inline string (STR_I)"""
-        self.write_byte(STR_I)
-        self.output.write(s.encode('utf-8'))
-        self.write_byte(0)  # null terminator
+        out = self.output
+        out.append(STR_I)
+        out += s.encode('utf-8')
+        out.append(0)  # null terminator
 
     def write_opaque(self, data: bytes):
         """Write opaque data"""
         self.write_byte(OPAQUE)
         self.write_mb_uint32(len(data))
-        self.output.write(data)
+        self.output += data
 
     def add_to_string_table(self, s: str) -> int:
         """Add string to string table and return offset"""
         if s in self.string_table_index:
             return self.string_table_index[s]
 
-        offset = self.string_table.tell()
+        offset = len(self.string_table)
         self.string_table_index[s] = offset
-        self.string_table.write(s.encode('utf-8'))
-        self.string_table.write(b'\x00')
+        self.string_table += s.encode('utf-8')
+        self.string_table.append(0)
         return offset
 
     def get_tag_token(self, tag_name: str, page: int) -> Optional[int]:
         """Get token for tag name in given code page"""
-        tags_rev = CODE_PAGES_REV.get(page, SYNCML_TAGS_REV)
-        return tags_rev.get(tag_name)
+        if page not in CODE_PAGES_REV:
+            page = 0
+        paged = TAG_INDEX.get(tag_name)
+        if paged is not None and paged[0] == page:
+            return paged[1]
+        return None
 
     def switch_page(self, page: int):
         """Switch to a different code page"""
@@ -242,23 +353,17 @@ class WBXMLEncoder:
 
     def encode(self, root: ET.Element) -> bytes:
         """Encode ElementTree to WBXML"""
-        # Build string table first (for literal tags)
-        self.build_string_table(root)
-
-        # Header will be written later
-        body_start = self.output.tell()
+        self.reset()
 
-        # Encode body
+        # Encode body (literal tags are added to the string table as we go)
         self.encode_element(root)
 
         # Build final output with header
-        body = self.output.getvalue()
-        string_table = self.string_table.getvalue()
-
-        final = io.BytesIO()
+        body = self.output
+        string_table = self.string_table
 
         # WBXML Version 1.3
-        final.write(bytes([0x03]))
+        final = bytearray(b'\x03')
 
         # Public ID - SyncML 1.2
         self.write_mb_uint32_to(final, SYNCML_1_2_PUBLIC_ID)
@@ -268,91 +373,98 @@ class WBXMLEncoder:
 
         # String table length and content
         self.write_mb_uint32_to(final, len(string_table))
-        final.write(string_table)
+        final += string_table
 
         # Body
-        final.write(body)
+        final += body
 
-        return final.getvalue()
+        return bytes(final)
 
-    def write_mb_uint32_to(self, stream: io.BytesIO, value: int):
-        """Write multi-byte uint32 to specific stream"""
-        if value == 0:
-            stream.write(bytes([0]))
+    def write_mb_uint32_to(self, stream: bytearray, value: int):
+        """Write multi-byte uint32 to specific buffer"""
+        if value < 0x80:
+            stream.append(value)
             return
 
-        bytes_list = []
-        while value > 0:
-            bytes_list.insert(0, value & 0x7F)
+        # Fill a buffer of the exact length from the low end, all bytes but
+        # the last carrying the continuation bit
+        n = (value.bit_length() + 6) // 7
+        buf = bytearray(n)
+        buf[n - 1] = value & 0x7F
+        for i in range(n - 2, -1, -1):
             value >>= 7
-
-        for i, b in enumerate(bytes_list):
-            if i < len(bytes_list) - 1:
-                b |= 0x80
-            stream.write(bytes([b]))
-
-    def build_string_table(self, elem: ET.Element):
-        """Pre-scan elements to build string table for unknown tags"""
-        tag_name = elem.tag
-        # Check if tag needs to be in string table
-        if self.get_tag_token(tag_name, 0) is None and self.get_tag_token(tag_name, 1) is None:
-            self.add_to_string_table(tag_name)
-
-        for child in elem:
-            self.build_string_table(child)
-
-    def encode_element(self, elem: ET.Element):
-        """Encode a single element"""
-        tag_name = elem.tag
-
-        # Determine code page and token
-        token = self.get_tag_token(tag_name, 0)
-        page = 0
-
-        if token is None:
-            token = self.get_tag_token(tag_name, 1)
-            page = 1
-
-        if token is None:
-            # Use LITERAL with string table
-            self.switch_page(0)
-            has_content = bool(elem.text or len(elem) > 0)
-            literal_token = LITERAL
-            if has_content:
-                literal_token |= TAG_HAS_CONTENT
-            self.write_byte(literal_token)
-            offset = self.string_table_index.get(tag_name, 0)
-            self.write_mb_uint32(offset)
-        else:
-            self.switch_page(page)
-            has_content = bool(elem.text or len(elem) > 0)
-            if has_content:
-                token |= TAG_HAS_CONTENT
-            self.write_byte(token)
-
-        # Encode content
-        if elem.text or len(elem) > 0:
-            if elem.text:
-                self.write_string(elem.text)
-
-            for child in elem:
-                self.encode_element(child)
-                if child.tail:
-                    self.write_string(child.tail)
-
-            self.write_byte(END)
+            buf[i] = 0x80 | (value & 0x7F)
+        stream += buf
+
+    def encode_element(self, root: ET.Element):
+        """Encode an element and its subtree"""
+        # Walk with an explicit stack of (element, child iterator) instead of
+        # recursing, so there is no Python frame per element. The bottom
+        # entry is a sentinel parent holding just the root.
+        stack = [(None, iter((root,)))]
+        # Loop-invariant globals and bound methods as locals
+        tag_index_get = TAG_INDEX.get
+        _LITERAL, _TAG_HAS_CONTENT, _END = LITERAL, TAG_HAS_CONTENT, END
+        switch_page = self.switch_page
+        output = self.output
+        write_byte = output.append
+        write_string = self.write_string
+        while stack:
+            parent, children = stack[-1]
+            for elem in children:
+                tag_name = elem.tag
+                text = elem.text
+                has_content = bool(text or len(elem) > 0)
+
+                # Determine code page and token
+                paged = tag_index_get(tag_name)
+
+                if paged is None:
+                    # Use LITERAL with string table
+                    if self.current_page:
+                        switch_page(0)
+                    write_byte(_LITERAL | _TAG_HAS_CONTENT if has_content else _LITERAL)
+                    self.write_mb_uint32(self.add_to_string_table(tag_name))
+                else:
+                    page, token = paged
+                    if page != self.current_page:
+                        switch_page(page)
+                    write_byte(token | _TAG_HAS_CONTENT if has_content else token)
+
+                if has_content:
+                    if len(elem) == 0:
+                        # Text-only leaf (<Data>, <LocURI>, ...): write the
+                        # whole STR_I ... END run without descending
+                        output += _STR_I_PREFIX
+                        output += text.encode('utf-8')
+                        output += _NUL_END
+                    else:
+                        if text:
+                            write_string(text)
+                        # Descend; END and the tail are written once it's done
+                        stack.append((elem, iter(elem)))
+                        break
+
+                if parent is not None and elem.tail:
+                    write_string(elem.tail)
+            else:
+                stack.pop()
+                if parent is not None:
+                    write_byte(_END)
+                    if stack[-1][0] is not None and parent.tail:
+                        write_string(parent.tail)
 
 
 def decode_wbxml(data: bytes) -> ET.Element:
     """Convenience function to decode WBXML to ElementTree"""
-    decoder = WBXMLDecoder(data)
-    return decoder.decode()
+    with closing(WBXMLDecoder.acquire(data)) as decoder:
+        return decoder.decode()
 
 
 def encode_wbxml(root: ET.Element) -> bytes:
     """Convenience function to encode ElementTree to WBXML"""
-    encoder = WBXMLEncoder()
-    return encoder.encode(root)
+    with closing(WBXMLEncoder.acquire()) as encoder:
+        return encoder.encode(root)
 
 
 def wbxml_to_xml_string(data: bytes) -> str:
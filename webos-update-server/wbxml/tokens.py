@@ -5,6 +5,7 @@ Based on:
 - OMA-TS-SyncML_RepPro-V1_2 (SyncML Representation Protocol)
 - OMA-TS-DM_Protocol-V1_2 (OMA Device Management Protocol)
 """
+import sys
 
 # WBXML Global Tokens
 SWITCH_PAGE = 0x00
@@ -236,6 +237,12 @@ DMDDF_TAGS = {
     0x3C: 'ZeroOrOne',
 }
 
+# Intern every tag name so decoded elements all share one str per tag
+for _tags in (SYNCML_TAGS, METINF_TAGS, DEVINF_TAGS, DMDDF_TAGS):
+    for _token, _name in _tags.items():
+        _tags[_token] = sys.intern(_name)
+del _tags, _token, _name
+
 # Code page mapping
 CODE_PAGES = {
     0x00: SYNCML_TAGS,
@@ -246,3 +253,22 @@ CODE_PAGES_REV = {
     0x00: SYNCML_TAGS_REV,
     0x01: METINF_TAGS_REV,
 }
+
+# Tag name -> (code page, token) across CODE_PAGES_REV, for encoding with a
+# single lookup. Lower pages win when a name appears on more than one.
+# DevInf and DM DDF are separate WBXML documents with their own public IDs,
+# not code pages of a SyncML message, so their tags stay out of this.
+TAG_INDEX = {
+    name: (page, token)
+    for page in sorted(CODE_PAGES_REV, reverse=True)
+    for name, token in CODE_PAGES_REV[page].items()
+}
+
+# Flat tuple indexed by (page << 6) | token, for decoding a tag with one
+# subscript instead of a hash lookup. Unassigned tokens are None.
+CODE_PAGE_COUNT = max(CODE_PAGES) + 1
+FLAT_TAGS = tuple(
+    CODE_PAGES.get(page, {}).get(token)
+    for page in range(CODE_PAGE_COUNT)
+    for token in range(0x40)
+)